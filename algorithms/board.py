@@ -1,14 +1,29 @@
 from .snake import Snake
 from .constants import (EMPTY_SPACE_MAKERS, FOOD_MARKER, SAMARITAN_HEAD_MARKER,
     SAMARITAN_BODY_MARKER, ENEMY_SNAKE_HEAD_MARKER, ENEMY_SNAKE_BODY_MARKER,
-    SNAKE_TAIL_MARKER)
+    SNAKE_TAIL_MARKER, DEFAULT_PARAMETERS)
 from .utils import get_manhattan_distance, translate
 from heapq import heappush, heappop
-from .graph_algorithms import a_star, stall, bfs, advanced_floodfill
-from copy import deepcopy
+from .graph_algorithms import (a_star, a_star_paths, stall, bfs,
+    advanced_floodfill, is_reachable)
+from .cells import cell_tables, ray_tables, ray
+import copy
+from array import array
 from time import time
+from . import logger, metrics, counters, memory, traps, opponents
 
-DEBUG = True
+def deepcopy(thing):
+    '''copy.deepcopy, counted when the search counters are on.
+    '''
+    if counters.ENABLED:
+        counters.count('deepcopy')
+    return copy.deepcopy(thing)
+
+# (board state, head, tail): whether the tail can be reached from the head.
+# Shared by every Board, as the same hypothetical position is often looked at
+# more than once in a move, e.g. each time paranoia sends us back.
+reachability_cache = {}
+MAX_CACHED_REACHABILITY = 1000
 
 class Board(object):
     '''
@@ -16,7 +31,8 @@ class Board(object):
     requesting a move.
     '''
 
-    def __init__(self, data, mode=0):
+    def __init__(self, data, mode=0, replanner=None, parameters=None,
+                 opponents=None, deadline=None):
         '''
         This function receives board information such as width and height and
         creates an empty grid to fill out once we recieve more information.
@@ -29,8 +45,15 @@ class Board(object):
         If mode is 2, then we are in a recursive call for the purposes of
         paranoia, it's going to need all the attacking strategies but no
         defensive one.
+        The replanner, if given, is used to reuse Samaritan's paths from the
+        previous turn. parameters overrides the costs and limits in
+        DEFAULT_PARAMETERS that Samaritan decides moves with.
+        The opponent model, if given, makes paranoia look at the enemies'
+        likely replies first. Once the deadline (a time()) has passed,
+        paranoia leaves out the replies the model finds unlikely.
         '''
         self.data = data
+        self.turn = data.get('turn')
         self.width = data['board']['width']
         self.height = data['board']['height']
         self.grid = []
@@ -39,14 +62,30 @@ class Board(object):
         self.other_snakes = [self._parse_snake_object(snake)
                              for snake in data['board']['snakes']
                              if self.samaritan.id != snake['id']]
-        if DEBUG and mode == 0:
+        if mode == 0 and logger.is_enabled(logger.DEBUG):
             for snake in self.other_snakes:
-                print(snake)
+                logger.debug("%s", snake)
         self.mode = mode
+        if counters.ENABLED and mode != 0:
+            counters.count('sub_boards')
+        self.replanner = replanner
+        self.parameters = dict(DEFAULT_PARAMETERS, **(parameters or {}))
+        self.opponents = opponents
+        self.deadline = deadline
         self.bad_moves = []
+        # (target, cost limit): (a_star_paths for Samaritan, paths it yielded)
+        self.path_searches = {}
+        self.nodes, self.cell_neighbours = cell_tables(self.width, self.height)
+        self.food_cells = bytearray(self.width * self.height)
+        for xcoord, ycoord in self.foods:
+            if -1 < xcoord < self.width and -1 < ycoord < self.height:
+                self.food_cells[ycoord * self.width + xcoord] = 1
         self._mark_grid()
-        if DEBUG and mode == 0:
-            self.print_grid()
+        self._mark_vacate_times()
+        self.gates = None
+        self.key = None
+        if mode == 0:
+            logger.debug("Grid:\n%s", logger.GridDump(self.grid))
 
 
     def _parse_data_list(self, data_list):
@@ -96,14 +135,74 @@ class Board(object):
         for x, y in self.foods:
             self.grid[y][x] = FOOD_MARKER
 
-    def print_grid(self):
-        '''A method that prints the grid.
+    def _mark_vacate_times(self):
+        '''
+        Works out how many turns every node takes to be free, which is all
+        is_valid_coordinate needs to know. Free nodes take 0. A snake's node
+        takes as long as his tail needs to move off it (after he's done
+        growing), if he eats nothing. Every food eaten on the way keeps the
+        bodies in place a turn longer, so a node is free after distance turns
+        with foods eaten when its time + foods <= distance. That makes this the
+        occupancy of every node at every future turn, in one number per node.
+        '''
+        self.vacate_times = array('i', [0]) * (self.width * self.height)
+        # 1 where there's a body or food, the cells a run along a ray has to
+        # stop and look at (see walling_enemies).
+        self.occupied_cells = bytearray(self.food_cells)
+        for snake in self.all_snake_objects():
+            time_to_disappear = snake.how_long_to_grow()
+            for xcoord, ycoord in reversed(snake.coordinates_with_no_repeats()):
+                time_to_disappear += 1
+                if not (-1 < xcoord < self.width and -1 < ycoord < self.height):
+                    continue
+                index = ycoord * self.width + xcoord
+                # The soonest any snake moves off it, like the first match
+                # from the tail in is_valid_coordinate used to be.
+                if (self.vacate_times[index] == 0
+                    or time_to_disappear < self.vacate_times[index]):
+                    self.vacate_times[index] = time_to_disappear
+                self.occupied_cells[index] = 1
+        for xcoord, ycoord in self.foods:
+            if -1 < xcoord < self.width and -1 < ycoord < self.height:
+                self.vacate_times[ycoord * self.width + xcoord] = 0
+
+    def state_key(self):
+        '''
+        Returns a hashable key for everything the searches look at on the
+        board: its size, the foods and the bodies of the snakes.
+        '''
+        if self.key is None:
+            # Packed into bytes, as tuples of nodes take up a lot more memory
+            # in the cache.
+            values = array('h', [self.width, self.height, len(self.foods)])
+            for node in sorted(self.foods):
+                values.extend(node)
+            for coordinates in sorted(snake.coordinates
+                                      for snake in self.all_snake_objects()):
+                values.append(len(coordinates))
+                for node in coordinates:
+                    values.extend(node)
+            self.key = values.tobytes()
+        return self.key
+
+    def can_reach_tail(self, snake):
+        '''
+        Tells us whether snake can still reach its tail, i.e. whether bfs
+        from its head to its tail would find a path. Answers are cached by
+        board state, so each position is only searched once.
         '''
-        for row in self.grid:
-            for point in row:
-                print(point, end=' ')
-            print()
-        print()
+        key = (self.state_key(), snake.get_head(), snake.get_tail())
+        reachable = reachability_cache.get(key)
+        if reachable is not None:
+            if counters.ENABLED:
+                counters.count('reachability_cache_hits')
+            return reachable
+        if len(reachability_cache) >= MAX_CACHED_REACHABILITY:
+            reachability_cache.clear()
+        reachable = is_reachable(self, snake.get_head(), snake.get_tail(),
+                                 snake)
+        reachability_cache[key] = reachable
+        return reachable
 
     def all_snake_objects(self):
         '''A method that returns all snake objects on the board.
@@ -137,7 +236,14 @@ class Board(object):
         foods_in_path: If there is > 0 food in our path, this will increase the
         time to disappear for non-empty nodes that are samaritan's snake.
         '''
+        if counters.ENABLED:
+            counters.count('get_neighbours')
         xcoord, ycoord = node
+        if -1 < xcoord < self.width and -1 < ycoord < self.height:
+            nodes = self.nodes
+            return [nodes[cell] for cell in self.get_neighbour_cells(
+                                ycoord * self.width + xcoord,
+                                distance_to_neighbour_nodes, foods_in_path)]
         neighbours = [
             (xcoord + 1, ycoord), (xcoord - 1, ycoord),
             (xcoord, ycoord + 1), (xcoord, ycoord - 1)
@@ -148,33 +254,36 @@ class Board(object):
                                             distance_to_neighbour_nodes,
                                             foods_in_path)]
 
+    def get_neighbour_cells(self, cell, distance_to_neighbour_nodes=1,
+                            foods_in_path=0):
+        '''
+        get_neighbours for cells (see cells.py): the cells next to cell that
+        will be free distance_to_neighbour_nodes turns from now.
+        '''
+        if counters.ENABLED:
+            # Counted like the four is_valid_coordinate calls it replaces.
+            counters.count('is_valid_coordinate', 4)
+        vacate_times = self.vacate_times
+        return [neighbour for neighbour in self.cell_neighbours[cell]
+                if (vacate_times[neighbour] == 0
+                    or vacate_times[neighbour] + foods_in_path
+                       <= distance_to_neighbour_nodes)]
+
     def is_valid_coordinate(self, xcoord, ycoord, snake, distance_to_node,
                             foods_in_path=0):
         '''
         Check if a node is a valid node that Samaritan can go to without dying
         i.e., it's not out of the board, and if it's a wall, it won't be a
-        wall by the time I get to it.
+        wall by the time I get to it (distance_to_node turns from now, having
+        eaten foods_in_path foods on the way).
         '''
-        node = (xcoord, ycoord)
+        if counters.ENABLED:
+            counters.count('is_valid_coordinate')
         if not (-1 < xcoord < self.width and -1 < ycoord < self.height):
             return False
-        node_empty = (self.grid[ycoord][xcoord] == FOOD_MARKER or
-                      self.grid[ycoord][xcoord] == EMPTY_SPACE_MAKERS)
-        if node_empty:
-            return True
-        for snake in self.all_snake_objects():
-            if node in snake.coordinates:
-                time_to_disappear = snake.how_long_to_grow()
-                time_to_disappear += foods_in_path
-                snake_coordinates = snake.coordinates_with_no_repeats()
-                for snakes_node in reversed(snake_coordinates):
-                    time_to_disappear += 1
-                    if snakes_node == node:
-                        break
-                if time_to_disappear <= distance_to_node:
-                    node_empty = True
-
-        return node_empty
+        time_to_disappear = self.vacate_times[ycoord * self.width + xcoord]
+        return (time_to_disappear == 0
+                or time_to_disappear + foods_in_path <= distance_to_node)
 
     def get_cost(self, node, my_snake, distance_to_node, foods_in_path):
         '''
@@ -184,6 +293,8 @@ class Board(object):
         Costs are rated from a scale of 1-10 with the only exception being if
         we have predetermined that it's a bad move through paranoid algorithms
         '''
+        if counters.ENABLED:
+            counters.count('get_cost')
         xcoord, ycoord = node
         cost = 1
         # neighbours = [
@@ -195,6 +306,7 @@ class Board(object):
         if (distance_to_node == 1
             and translate(my_snake.get_head(), node) in self.bad_moves):
             cost += 99999
+        parameters = self.parameters
         for snake in self.all_snake_objects():
             if snake != my_snake:
                 if snake.length >= my_snake.length:
@@ -205,33 +317,34 @@ class Board(object):
                         if (trajectory == 'down' and (node == (x-1, y+1) or
                             node == (x+1, y+1))):
                             if snake.length > my_snake.length:
-                                cost += 3
+                                cost += parameters['larger_head_diagonal_cost']
                             else:
-                                cost += 1
+                                cost += parameters['equal_head_diagonal_cost']
                         elif (trajectory == 'up' and (node == (x-1, y-1) or
                             node == (x+1, y-1))):
                             if snake.length > my_snake.length:
-                                cost += 3
+                                cost += parameters['larger_head_diagonal_cost']
                             else:
-                                cost += 1
+                                cost += parameters['equal_head_diagonal_cost']
                         elif (trajectory == 'left' and (node == (x-1, y-1) or
                             node == (x-1, y+1))):
                             if snake.length > my_snake.length:
-                                cost += 3
+                                cost += parameters['larger_head_diagonal_cost']
                             else:
-                                cost += 1
+                                cost += parameters['equal_head_diagonal_cost']
                         elif (trajectory == 'right' and (node == (x+1, y-1) or
                             node == (x+1, y+1))):
                             if snake.length > my_snake.length:
-                                cost += 2
+                                cost += parameters[
+                                    'larger_head_diagonal_cost_right']
                             else:
-                                cost += 1
+                                cost += parameters['equal_head_diagonal_cost']
         valid_neighbours = self.get_neighbours(node, my_snake, distance_to_node,
                                                foods_in_path)
         for snake in self.other_snakes:
             if (snake.get_head() in valid_neighbours
                 and snake.length > my_snake.length):
-                cost += 6
+                cost += parameters['larger_head_adjacent_cost']
         #         if (snake.get_head() in neighbours
         #             and snake.length > my_snake.length):
         #             cost += 10
@@ -251,7 +364,7 @@ class Board(object):
         #
         if (xcoord == (self.width-1) or ycoord == (self.height-1) or xcoord == 0
             or ycoord == 0): # node is on the edges
-            cost += 1
+            cost += parameters['edge_cost']
         #     if my_snake != self.samaritan:
         #         return cost
         #     for snake in self.all_snake_objects():
@@ -301,104 +414,89 @@ class Board(object):
                 i = i + 1
                 objective, move = None, None
                 if len(self.other_snakes) == 0:
-                    health_limit = 70 # if i am playing alone, then get food more.
+                    # if i am playing alone, then get food more.
+                    health_limit = self.parameters['health_limit_alone']
                 else:
-                    health_limit = 40
+                    health_limit = self.parameters['health_limit']
                 if i == 0:
-                    start = time()
-                    if objective == None:
+                    if (objective == None
+                        and self.passes_gate("cornering", "cornering")):
+                        start = self.start_strategy()
                         objective, move, enemy_id = self.cornering_enemies()
-                        if DEBUG:
-                            print("Time to corner {}ms".format((time() - start) * 1000))
-                    start = time()
-                    if objective == None:
+                        self.record_time("cornering", start)
+                    if (objective == None
+                        and self.passes_gate("trapping", "trapping")):
+                        start = self.start_strategy()
                         objective, move, enemy_id = self.trapping_enemies()
-                        if DEBUG:
-                            print("Time to trap {}ms".format((time() - start) * 1000))
-                    start = time()
-                    if objective == None:
+                        self.record_time("trapping", start)
+                    if (objective == None
+                        and self.passes_gate("walling", "walling")):
+                        start = self.start_strategy()
                         objective, move, enemy_id = self.walling_enemies()
-                        if DEBUG:
-                            print("Time to wall {}ms".format((time() - start) * 1000))
+                        self.record_time("walling", start)
                 if (self.samaritan.health <= health_limit):
-                    if DEBUG:
-                        print("Samaritan's health is low.")
-                    start = time()
+                    logger.debug("Samaritan's health is low.")
+                    start = self.start_strategy()
                     if objective == None:
                         objective, move = self.find_path_to_food("Safe")
-                        if DEBUG:
-                            print("Time to find safe food {}ms".format((time() - start) * 1000))
-                    start = time()
+                        self.record_time("safe food", start)
+                    start = self.start_strategy()
                     if objective == None:
                         objective, move = self.find_path_to_food("Risky")
-                        if DEBUG:
-                            print("Time to find risky food {}ms".format((time() - start) * 1000))
-                    start = time()
+                        self.record_time("risky food", start)
+                    start = self.start_strategy()
                     if self.is_samaritan_biggest():
                         if objective == None:
                             objective, move = self.attack_enemy()
-                            if DEBUG:
-                                print("Time to attack {}ms".format((time() - start) * 1000))
+                            self.record_time("attack", start)
                     else:
                         if objective == None:
                             objective, move = self.find_path_to_my_tail()
-                            if DEBUG:
-                                print("Time to find tail {}ms".format((time() - start) * 1000))
+                            self.record_time("tail", start)
                 elif not self.is_samaritan_biggest():
-                    if DEBUG:
-                        print("Samaritan isn't the biggest; Prioritizing food.")
-                    start = time()
+                    logger.debug("Samaritan isn't the biggest; Prioritizing food.")
+                    start = self.start_strategy()
                     if objective == None:
                         objective, move = self.find_path_to_food("Safe")
-                        if DEBUG:
-                            print("Time to find safe food {}ms".format((time() - start) * 1000))
-                    start = time()
+                        self.record_time("safe food", start)
+                    start = self.start_strategy()
                     if objective == None:
                         objective, move = self.find_path_to_food("Risky")
-                        if DEBUG:
-                            print("Time to find risky food {}ms".format((time() - start) * 1000))
-                    start = time()
+                        self.record_time("risky food", start)
+                    start = self.start_strategy()
                     if objective == None:
                         objective, move = self.find_path_to_my_tail()
-                        if DEBUG:
-                            print("Time to find tail {}ms".format((time() - start) * 1000))
+                        self.record_time("tail", start)
                 else:
-                    if DEBUG:
-                        print("We are the biggest, and we don't need food. Attack.")
-                    start = time()
+                    logger.debug("We are the biggest, and we don't need food. Attack.")
+                    start = self.start_strategy()
                     if objective == None:
                         objective, move = self.find_path_to_food("Safe")
-                        if DEBUG:
-                            print("Time to find safe food {}ms".format((time() - start) * 1000))
-                    start = time()
+                        self.record_time("safe food", start)
+                    start = self.start_strategy()
                     if objective == None:
                         objective, move = self.attack_enemy()
-                        if DEBUG:
-                            print("Time to attack {}ms".format((time() - start) * 1000))
-                    start = time()
+                        self.record_time("attack", start)
+                    start = self.start_strategy()
                     if objective == None:
                         objective, move = self.find_path_to_my_tail()
-                        if DEBUG:
-                            print("Time to find tail {}ms".format((time() - start) * 1000))
-                    start = time()
+                        self.record_time("tail", start)
+                    start = self.start_strategy()
                     if objective == None:
                         objective, move = self.find_path_to_food("Risky")
-                        if DEBUG:
-                            print("Time to find risky food {}ms".format((time() - start) * 1000))
+                        self.record_time("risky food", start)
                 if objective == None:
-                    start = time()
+                    start = self.start_strategy()
                     objective, move = stall(self)
-                    if DEBUG:
-                        print("Time to stall {}ms".format((time() - start) * 1000))
+                    self.record_time("stall", start)
                 if objective == None:
-                    return ('Death', 'left')
+                    return self.finish_action('Death', 'left', i)
                 if len(self.other_snakes) == 0:
-                    return (objective, move)
-                start = time()
+                    return self.finish_action(objective, move, i)
+                start = self.start_strategy()
                 e_objective, e_move, snake = self.get_best_enemy_attack(
                                                     objective, move)
-                if DEBUG:
-                    print("Time to paranoia {}ms".format((time() - start) * 1000))
+                self.record_time("paranoia", start)
                 if e_objective == None:
                     break
                 elif i > 2:
@@ -414,45 +512,123 @@ class Board(object):
                                     self.get_cost(neighbour, self.samaritan, 1,
                                                   foods), neighbour))
                     floodfill, min_cost, neighbour = heappop(all_moves)
-                    return ('Best Bad Move', translate(
-                                        self.samaritan.get_head(), neighbour))
+                    return self.finish_action('Best Bad Move', translate(
+                                    self.samaritan.get_head(), neighbour), i)
                 else:
                     self.bad_moves.append(move)
-                    if DEBUG:
-                        print("Bad objective and bad move: {}, {}".format(
-                                                            objective, move))
+                    logger.debug("Bad objective and bad move",
+                                 objective=objective, move=move)
                     objective, move = None, None
                     continue
-            return (objective, move)
+            return self.finish_action(objective, move, i)
         else:
             samaritan = self.other_snakes[-1]
-            start = time()
-            objective, move, enemy_id = self.cornering_enemies()
-            if DEBUG:
-                print("Time for paranoid cornering {}ms".format(time() - start))
-            if enemy_id == samaritan.id:
-                return (objective, move, enemy_id)
-            start = time()
-            objective, move, enemy_id = self.trapping_enemies()
-            if DEBUG:
-                print("Time for paranoid trapping {}ms".format(time() - start))
-            if enemy_id == samaritan.id:
-                return (objective, move, enemy_id)
-            start = time()
-            objective, move, enemy_id = self.walling_enemies()
-            if DEBUG:
-                print("Time for paranoid walling {}ms".format(time() - start))
-            if enemy_id == samaritan.id:
-                return (objective, move, enemy_id)
-            start = time()
-            accessible_to_tail = bfs(self, samaritan.get_head(),
-                                        samaritan.get_tail(), samaritan)
-            if DEBUG:
-                print("Time for paranoid tailing {}ms".format(time() - start))
-            if accessible_to_tail == (None, None):
+            if self.passes_gate("cornering", "paranoid cornering"):
+                start = self.start_strategy()
+                objective, move, enemy_id = self.cornering_enemies()
+                self.record_time("paranoid cornering", start)
+                if enemy_id == samaritan.id:
+                    return (objective, move, enemy_id)
+            if self.passes_gate("trapping", "paranoid trapping"):
+                start = self.start_strategy()
+                objective, move, enemy_id = self.trapping_enemies()
+                self.record_time("paranoid trapping", start)
+                if enemy_id == samaritan.id:
+                    return (objective, move, enemy_id)
+            if self.passes_gate("walling", "paranoid walling"):
+                start = self.start_strategy()
+                objective, move, enemy_id = self.walling_enemies()
+                self.record_time("paranoid walling", start)
+                if enemy_id == samaritan.id:
+                    return (objective, move, enemy_id)
+            start = self.start_strategy()
+            accessible_to_tail = self.can_reach_tail(samaritan)
+            self.record_time("paranoid tailing", start)
+            if not accessible_to_tail:
                 return ('Walling off', 'right', samaritan.id)
             return (None, None, None)
 
+    def get_gates(self):
+        '''
+        Works out, once per board, which of the attacking strategies could
+        possibly find something, from what they need before they can:
+        cornering: an enemy with exactly one free node next to his head.
+        trapping: an enemy's head on an edge, with Samaritan's head at most 2
+            nodes away from it (the furthest any trap in traps.py is).
+        walling: an enemy, and a node Samaritan can move to.
+        A strategy that doesn't pass its gate would have returned nothing.
+        '''
+        if self.gates is None:
+            head_x, head_y = self.samaritan.get_head()
+            self.gates = {
+                'cornering': any(
+                    len(self.get_neighbours(snake.get_head(), snake)) == 1
+                    for snake in self.other_snakes),
+                'trapping': any(
+                    traps.edge(snake.get_head(), self.width, self.height)
+                    is not None
+                    and (abs(snake.get_head()[0] - head_x)
+                         + abs(snake.get_head()[1] - head_y)) <= 2
+                    for snake in self.other_snakes),
+                'walling': (len(self.other_snakes) > 0
+                            and len(self.get_neighbours(
+                                self.samaritan.get_head(), self.samaritan)) > 0),
+            }
+        return self.gates
+
+    def passes_gate(self, gate, strategy):
+        '''
+        Tells us whether strategy should be run, from its gate (see
+        get_gates). Skipped strategies are counted along with the time they
+        take on average when they're run, as an estimate of the time saved.
+        '''
+        passed = self.get_gates()[gate]
+        board = metrics.board_size(self)
+        metrics.increment('samaritan_gate_total', strategy=strategy,
+                          passed='true' if passed else 'false', board=board)
+        if not passed:
+            saved = metrics.mean('samaritan_strategy_ms', strategy=strategy,
+                                 board=board)
+            if saved is not None:
+                metrics.increment('samaritan_gate_saved_ms', saved,
+                                  strategy=strategy, board=board)
+            logger.debug("Strategy skipped", strategy=strategy,
+                         saved_ms=saved)
+        return passed
+
+    def start_strategy(self):
+        '''
+        Returns what record_time needs to know about when a strategy started:
+        the time, and where memory was at when it's being tracked.
+        '''
+        return (time(), memory.begin() if memory.ENABLED else None)
+
+    def record_time(self, strategy, start):
+        '''
+        Logs and records how long a strategy took, and the memory it used when
+        that's being tracked, since start (from start_strategy).
+        '''
+        started, memory_token = start
+        elapsed = (time() - started) * 1000
+        logger.debug("Strategy timing", strategy=strategy, ms=elapsed)
+        metrics.observe('samaritan_strategy_ms', elapsed, strategy=strategy,
+                        board=metrics.board_size(self))
+        if memory_token is not None:
+            peak_bytes, net_blocks = memory.end(strategy, memory_token)
+            logger.debug("Strategy memory", strategy=strategy,
+                         peak_bytes=peak_bytes, net_blocks=net_blocks)
+
+    def finish_action(self, objective, move, retries):
+        '''
+        Records which objective won and how many times paranoia sent us back
+        to look for another move, then returns the action.
+        '''
+        metrics.increment('samaritan_objective_total', objective=objective,
+                          board=metrics.board_size(self))
+        metrics.observe('samaritan_bad_move_retries', retries,
+                        board=metrics.board_size(self))
+        return (objective, move)
+
     def cornering_enemies(self):
         '''
         This attack tactic by samaritan corners an enemy if the enemy is
@@ -483,9 +659,7 @@ class Board(object):
             if (enemy_distance < get_manhattan_distance(
                                         self.samaritan.get_head(), exit_node)):
                 return (None, None, None)
-            samaritan_cost, samaritan_path = a_star(self,
-                                    self.samaritan.get_head(), exit_node,
-                                    self.samaritan)
+            samaritan_cost, samaritan_path = self.find_path(exit_node)
             # removed 'or enemy_distance == None' from below
             if (samaritan_cost == None or len(samaritan_path) == 1):
                 continue
@@ -501,8 +675,7 @@ class Board(object):
                 exit_node = curr_node
                 enemy_distance = get_manhattan_distance(snake.get_head(),
                                                         exit_node)
-                samaritan_cost, samaritan_path = a_star(self,
-                        self.samaritan.get_head(), exit_node, self.samaritan)
+                samaritan_cost, samaritan_path = self.find_path(exit_node)
                 # removed 'or enemy_distance == None' from below
                 if (samaritan_cost == None or len(samaritan_path) == 1):
                     continue
@@ -524,139 +697,26 @@ class Board(object):
             xcoord, ycoord = snake.get_head()
             direction_of_enemy = translate(snake.coordinates[1],
                                            snake.get_head())
-            permissible_directions_for_samaritan = [direction_of_enemy]
             my_direction = translate(self.samaritan.coordinates[1],
                                      self.samaritan.get_head())
-            move = None
-            if xcoord == self.width-1:
-                permissible_directions_for_samaritan.append('right')
-                if my_direction in permissible_directions_for_samaritan:
-                    if (self.samaritan.get_head() == (self.width-2, ycoord)
-                        and self.is_valid_move(direction_of_enemy)):
-                        move = direction_of_enemy
-                    elif (self.samaritan.get_head() == (self.width-3, ycoord)
-                          and self.is_valid_move('right')
-                          and snake.length < self.samaritan.length):
-                          move = 'right'
-                    elif (self.samaritan.get_head() == (self.width-2, ycoord-1)
-                          and direction_of_enemy == 'down'
-                          and snake.length < self.samaritan.length
-                          and self.is_valid_move('down')):
-                          move = 'down'
-                    elif (self.samaritan.get_head() == (self.width-2, ycoord+1)
-                          and direction_of_enemy == 'up'
-                          and snake.length < self.samaritan.length
-                          and self.is_valid_move('up')):
-                          move = 'up'
-                    elif (self.samaritan.get_head() == (self.width-2, ycoord+1)
-                          and direction_of_enemy == 'down'
-                          and (len(self.get_neighbours(snake.get_head(),
-                                                      snake)) <= 1)
-                          and self.is_valid_move('down')):
-                          move = 'down'
-                    elif (self.samaritan.get_head() == (self.width-2, ycoord-1)
-                          and direction_of_enemy == 'up'
-                          and (len(self.get_neighbours(snake.get_head(),
-                                                      snake, 1)) <= 1)
-                          and self.is_valid_move('up')):
-                          move = 'up'
-            elif xcoord == 0:
-                permissible_directions_for_samaritan.append('left')
-                if my_direction in permissible_directions_for_samaritan:
-                    if (self.samaritan.get_head() == (1, ycoord)
-                        and self.is_valid_move(direction_of_enemy)):
-                        move = direction_of_enemy
-                    elif (self.samaritan.get_head() == (2, ycoord)
-                          and self.is_valid_move('left')
-                          and snake.length < self.samaritan.length):
-                          move = 'left'
-                    elif (self.samaritan.get_head() == (1, ycoord-1)
-                          and direction_of_enemy == 'down'
-                          and snake.length < self.samaritan.length
-                          and self.is_valid_move('down')):
-                          move = 'down'
-                    elif (self.samaritan.get_head() == (1, ycoord+1)
-                          and direction_of_enemy == 'up'
-                          and snake.length < self.samaritan.length
-                          and self.is_valid_move('up')):
-                          move = 'up'
-                    elif (self.samaritan.get_head() == (1, ycoord+1)
-                          and direction_of_enemy == 'down'
-                          and (len(self.get_neighbours(snake.get_head(),
-                                                      snake, 1)) <= 1)
-                          and self.is_valid_move('down')):
-                          move = 'down'
-                    elif (self.samaritan.get_head() == (1, ycoord-1)
-                          and direction_of_enemy == 'up'
-                          and (len(self.get_neighbours(snake.get_head(),
-                                                      snake, 1)) <= 1)
-                          and self.is_valid_move('up')):
-                          move = 'up'
-            elif ycoord == self.width-1:
-                permissible_directions_for_samaritan.append('down')
-                if my_direction in permissible_directions_for_samaritan:
-                    if (self.samaritan.get_head() == (xcoord, self.height-2)
-                        and self.is_valid_move(direction_of_enemy)):
-                        move = direction_of_enemy
-                    elif (self.samaritan.get_head() == (xcoord, self.height-3)
-                          and self.is_valid_move('down')
-                          and snake.length < self.samaritan.length):
-                          move = 'down'
-                    elif (self.samaritan.get_head() == (xcoord-1, self.height-2)
-                          and direction_of_enemy == 'right'
-                          and snake.length < self.samaritan.length
-                          and self.is_valid_move('right')):
-                          move = 'right'
-                    elif (self.samaritan.get_head() == (xcoord+1, self.height-2)
-                          and direction_of_enemy == 'left'
-                          and snake.length < self.samaritan.length
-                          and self.is_valid_move('left')):
-                          move = 'left'
-                    elif (self.samaritan.get_head() == (xcoord+1, self.height-2)
-                          and direction_of_enemy == 'right'
-                          and (len(self.get_neighbours(snake.get_head(),
-                                                       snake, 1)) <= 1)
-                          and self.is_valid_move('right')):
-                          move = 'right'
-                    elif (self.samaritan.get_head() == (xcoord-1, self.height-2)
-                          and direction_of_enemy == 'left'
-                          and (len(self.get_neighbours(snake.get_head(),
-                                                       snake, 1)) <= 1)
-                          and self.is_valid_move('left')):
-                          move = 'left'
-            elif ycoord == 0:
-                permissible_directions_for_samaritan.append('up')
-                if my_direction in permissible_directions_for_samaritan:
-                    if (self.samaritan.get_head() == (xcoord, 1)
-                        and self.is_valid_move(direction_of_enemy)):
-                        move = direction_of_enemy
-                    elif (self.samaritan.get_head() == (xcoord, 2)
-                          and self.is_valid_move('up')
-                          and snake.length < self.samaritan.length):
-                          move = 'up'
-                    elif (self.samaritan.get_head() == (xcoord-1, 1)
-                          and direction_of_enemy == 'right'
-                          and snake.length < self.samaritan.length
-                          and self.is_valid_move('right')):
-                          move = 'right'
-                    elif (self.samaritan.get_head() == (xcoord+1, 1)
-                          and direction_of_enemy == 'left'
-                          and snake.length < self.samaritan.length
-                          and self.is_valid_move('left')):
-                          move = 'left'
-                    elif (self.samaritan.get_head() == (xcoord+1, 1)
-                          and direction_of_enemy == 'right'
-                          and (len(self.get_neighbours(snake.get_head(),
-                                                       snake, 1)) <= 1)
-                          and self.is_valid_move('right')):
-                          move = 'right'
-                    elif (self.samaritan.get_head() == (xcoord-1, 1)
-                          and direction_of_enemy == 'left'
-                          and (len(self.get_neighbours(snake.get_head(),
-                                                       snake, 1)) <= 1)
-                          and self.is_valid_move('left')):
-                          move = 'left'
-            if move is not None:
+            enemy_edge = traps.edge(snake.get_head(), self.width, self.height)
+            if (enemy_edge is None
+                or my_direction not in (direction_of_enemy, enemy_edge)):
+                continue
+            head_x, head_y = self.samaritan.get_head()
+            trap = traps.PATTERNS.get((enemy_edge,
+                                       (head_x - xcoord, head_y - ycoord),
+                                       direction_of_enemy))
+            if trap is None:
+                continue
+            requirement, move = trap
+            if (requirement == traps.SHORTER
+                and snake.length >= self.samaritan.length):
+                continue
+            if (requirement == traps.CORNERED
+                and len(self.get_neighbours(snake.get_head(), snake)) > 1):
+                continue
+            if self.is_valid_move(move):
                 return ('Trapping', move, snake.id)
 
         return (None, None, None)
@@ -672,56 +732,77 @@ class Board(object):
             return (None, None, None)
         neighbours = self.get_neighbours(self.samaritan.get_head(),
                                          self.samaritan)
+        head = self.samaritan.get_head()
+        if not (-1 < head[0] < self.width and -1 < head[1] < self.height):
+            return (None, None, None)
+        head_cell = head[1] * self.width + head[0]
+        rays = ray_tables(self.width, self.height)
+        vacate_times = self.vacate_times
+        samaritan_nodes = set(self.samaritan.coordinates)
         moves_to_edge = []
         for neighbour in neighbours:
-            food_coordinates = self.foods[:]
-            other_snakes = deepcopy(self.other_snakes)
-            samaritan = deepcopy(self.samaritan)
-            start = self.samaritan.get_head()
-            destination = neighbour
-            distance_to_edge = 0
-            direction = translate(start, destination)
-            valid_move = True
-            path_to_edge = [self.samaritan.get_head()]
+            eaten = []
+            # index of an enemy: his coordinates after we ran over his tail
+            trimmed = {}
+            path_to_edge = [head]
             foods = 0
+            health = self.samaritan.health
             health_loss = 0
-            while valid_move:
-                target_x, target_y = destination
-                if self.grid[target_y][target_x] != EMPTY_SPACE_MAKERS:
-                    if destination in food_coordinates:
-                        food_coordinates.remove(destination)
-                        samaritan.health = 100
-                        foods += 1
-                        health_loss = 0
-                    else:
-                        if destination not in samaritan.coordinates:
-                            its_a_tail = False
-                            for snake in other_snakes:
-                                if snake.get_tail() == destination:
-                                    if len(snake.coordinates) == 1:
-                                        break
-                                    its_a_tail = True
-                                    snake.coordinates.remove(destination)
-                            if not its_a_tail:
+            # Straight on from the neighbour until a node won't be free by the
+            # time we get to it, or we run into a body that isn't a tail.
+            # Only the occupied cells on the way can stop us, so we jump from
+            # one to the next and take the empty cells between them at once.
+            line = ray(rays, translate(head, neighbour), head_cell)
+            line_nodes = self.nodes[line]
+            occupied = self.occupied_cells[line]
+            position = 0
+            while True:
+                next_position = occupied.find(1, position)
+                if next_position == -1:
+                    path_to_edge.extend(line_nodes[position:])
+                    health_loss += len(line_nodes) - position
+                    break
+                path_to_edge.extend(line_nodes[position:next_position])
+                health_loss += next_position - position
+                position = next_position + 1
+                distance = position
+                cell = line.start + next_position * line.step
+                time_to_disappear = vacate_times[cell]
+                if (distance > 1 and time_to_disappear != 0
+                    and time_to_disappear + foods > distance):
+                    break
+                node = line_nodes[next_position]
+                if self.food_cells[cell]:
+                    eaten.append(node)
+                    health = 100
+                    foods += 1
+                    health_loss = 0
+                elif time_to_disappear and node not in samaritan_nodes:
+                    its_a_tail = False
+                    for index, snake in enumerate(self.other_snakes):
+                        coordinates = trimmed.get(index, snake.coordinates)
+                        if coordinates[-1] == node:
+                            if len(coordinates) == 1:
                                 break
-                path_to_edge.append(destination)
-                start = destination
-                distance_to_edge += 1
+                            its_a_tail = True
+                            if index not in trimmed:
+                                coordinates = trimmed[index] = coordinates[:]
+                            coordinates.remove(node)
+                    if not its_a_tail:
+                        break
+                path_to_edge.append(node)
                 health_loss += 1
-                if direction == 'up':
-                    destination = (target_x, target_y-1)
-                elif direction == 'down':
-                    destination = (target_x, target_y+1)
-                elif direction == 'left':
-                    destination = (target_x-1, target_y)
-                else:
-                    destination = (target_x+1, target_y)
-                valid_move = self.is_valid_coordinate(destination[0],
-                                                      destination[1],
-                                                      self.samaritan,
-                                                      distance_to_edge+1,
-                                                      foods_in_path=foods)
-            samaritan.health -= health_loss
+            distance_to_edge = len(path_to_edge) - 1
+            food_coordinates = self.foods[:]
+            for node in eaten:
+                food_coordinates.remove(node)
+            other_snakes = [Snake(snake.name, snake.id, trimmed[index],
+                                  snake.health, snake.length)
+                            if index in trimmed else snake
+                            for index, snake in enumerate(self.other_snakes)]
+            samaritan = Snake(self.samaritan.name, self.samaritan.id,
+                              self.samaritan.coordinates[:],
+                              health - health_loss, self.samaritan.length)
             new_snake_coords = []
             if samaritan.health == 100:
                 samaritan.length += foods
@@ -752,17 +833,14 @@ class Board(object):
                         samaritan.coordinates.insert(0, (xcoord, ycoord))
 
             new_board = Board(self.generate_data_dictionary(food_coordinates,
-                                                    other_snakes, samaritan), 1)
+                                                    other_snakes, samaritan), 1,
+                              parameters=self.parameters)
             for x in range(len(new_board.other_snakes)):
                 enemy_snake = self.other_snakes[x]
                 future_enemy_snake = new_board.other_snakes[x]
-                if (bfs(new_board, future_enemy_snake.get_head(),
-                        future_enemy_snake.get_tail(), future_enemy_snake)
-                        == (None, None)):
-                    if (bfs(self, enemy_snake.get_head(),
-                               enemy_snake.get_tail(), enemy_snake)
-                               == (None, None)):
-                               continue
+                if not new_board.can_reach_tail(future_enemy_snake):
+                    if not self.can_reach_tail(enemy_snake):
+                        continue
                     can_wall_off_faster = True
                     for node in path_to_edge[1:]:
                         my_distance_to_node = get_manhattan_distance(
@@ -804,9 +882,8 @@ class Board(object):
         while cost_and_path_to_all_foods:
             distance_to_food, food = heappop(cost_and_path_to_all_foods)
             spaces_of_enemy_to_food = []
-            food_cost, food_path = a_star(self, self.samaritan.get_head(),
-                                                food, self.samaritan,
-                                                self.max_cost_to_food(risk))
+            food_cost, food_path = self.plan_path(('Food', food), food,
+                                                  self.max_cost_to_food(risk))
             if food_cost == None:
                 continue
             actual_distance_to_food = len(food_path) - 1
@@ -854,12 +931,9 @@ class Board(object):
                     samaritan.coordinates.insert(0, (xcoord, ycoord))
             samaritan.coordinates.append(samaritan.coordinates[-1])
             new_board = Board(self.generate_data_dictionary(food_coordinates,
-                                                    other_snakes, samaritan), 1)
-            distance_to_tail, path_to_tail = bfs(new_board,
-                                                new_board.samaritan.get_head(),
-                                                new_board.samaritan.get_tail(),
-                                                new_board.samaritan)
-            if distance_to_tail == None:
+                                                    other_snakes, samaritan), 1,
+                              parameters=self.parameters)
+            if not new_board.can_reach_tail(new_board.samaritan):
                 continue
 
             return ('{} food'.format(risk), translate(
@@ -876,8 +950,7 @@ class Board(object):
         halfway_y = int((self.height-1)/2)
         center = (halfway_x, halfway_y)
         if (get_manhattan_distance(self.samaritan.get_head(), center) > int(halfway_x/2)):
-            cost, path_to_center = a_star(self, self.samaritan.get_head(),
-                                                center, self.samaritan)
+            cost, path_to_center = self.plan_path('Center', center)
             if cost != None:
                 actual_distance_to_center = len(path_to_center) - 1
                 food_coordinates = self.foods[:]
@@ -912,19 +985,14 @@ class Board(object):
                         samaritan.coordinates.insert(0, (xcoord, ycoord))
                 samaritan.coordinates.append(samaritan.coordinates[-1])
                 new_board = Board(self.generate_data_dictionary(food_coordinates,
-                                                        other_snakes, samaritan), 1)
-                distance_to_tail, path_to_tail = bfs(new_board,
-                                                    new_board.samaritan.get_head(),
-                                                    new_board.samaritan.get_tail(),
-                                                    new_board.samaritan)
-                if distance_to_tail != None:
+                                                        other_snakes, samaritan), 1,
+                                  parameters=self.parameters)
+                if new_board.can_reach_tail(new_board.samaritan):
                     return ("Going to center", translate(
                                 self.samaritan.get_head(),path_to_center[1]))
 
-        cost_of_tail, path_to_tail = a_star(self,
-                                            self.samaritan.get_head(),
-                                            self.samaritan.get_tail(),
-                                            self.samaritan)
+        cost_of_tail, path_to_tail = self.plan_path('Tail',
+                                                    self.samaritan.get_tail())
         # print 'path found: ', path_to_tail
         if path_to_tail == None or len(path_to_tail) == 1:
             return (None, None)
@@ -944,10 +1012,7 @@ class Board(object):
 
         while attack_points:
             distance_to_attack_point, attack_point = heappop(attack_points)
-            cost_of_enemy, path_to_enemy = a_star(self,
-                                            self.samaritan.get_head(),
-                                            attack_point,
-                                            self.samaritan, 5)
+            cost_of_enemy, path_to_enemy = self.find_path(attack_point, 5)
             if cost_of_enemy != None:
                 return ('Attacking', translate(self.samaritan.get_head(),
                                            path_to_enemy[1]))
@@ -1013,12 +1078,13 @@ class Board(object):
                     new_other_snakes.remove(a_snake)
                     new_other_snakes = new_other_snakes + [new_samaritan]
                     new_samaritan = a_snake
-                    neighbours = self.get_neighbours(a_snake.get_head(),
-                                                     a_snake)
+                    replies = self.rank_replies(a_snake, self.get_neighbours(
+                        a_snake.get_head(), a_snake), foods,
+                        samaritan.get_head())
                     if a_snake.health != 100:
                         a_snake.coordinates.pop()
                     coordinates = a_snake.coordinates[:]
-                    for neighbour in neighbours:
+                    for likelihood, neighbour in replies:
                         a_snake.coordinates = coordinates[:]
                         if neighbour == new_other_snakes[-1].get_head():
                             if a_snake.length >= new_other_snakes[-1].length:
@@ -1026,16 +1092,92 @@ class Board(object):
                                     a_snake.get_head(), neighbour), a_snake.id)
                             else:
                                 continue
+                        if (likelihood < opponents.UNLIKELY
+                                and self.is_out_of_time()):
+                            metrics.increment(
+                                'samaritan_paranoia_pruned_total',
+                                board=metrics.board_size(self))
+                            logger.debug("Unlikely reply skipped",
+                                         snake=a_snake.id, move=translate(
+                                             a_snake.get_head(), neighbour),
+                                         likelihood=likelihood)
+                            continue
+                        reply_foods = new_foods[:]
                         if neighbour in foods:
-                            new_foods.remove(neighbour)
+                            reply_foods.remove(neighbour)
                         a_snake.coordinates.insert(0, neighbour)
                         new_board = Board(self.generate_data_dictionary(
-                                new_foods, new_other_snakes, new_samaritan), 2)
+                                reply_foods, new_other_snakes, new_samaritan),
+                                2, parameters=self.parameters)
                         objective, move, enemy_id = new_board.get_action()
                         if self.samaritan.id == enemy_id:
                             return (objective, move, snake.id)
         return (None, None, None)
 
+    def rank_replies(self, snake, neighbours, foods, target):
+        '''
+        Returns [(likelihood, neighbour)] for the moves an enemy could reply
+        with, most likely first, when the foods left are foods and Samaritan's
+        head will be at target.
+        Without an opponent model every reply is as likely, in the order of
+        neighbours.
+        '''
+        if self.opponents is None:
+            return [(1.0 / len(neighbours), neighbour)
+                    for neighbour in neighbours]
+        return self.opponents.rank(snake, neighbours, foods, target,
+                                   self.width, self.height)
+
+    def is_out_of_time(self):
+        '''Whether the board has a deadline and it has passed.
+        '''
+        return self.deadline is not None and time() > self.deadline
+
+    def plan_path(self, objective, target, cost_limit=99999):
+        '''
+        Finds Samaritan's path to target with A*. If the board has a replanner,
+        last turn's path for the same objective is reused where possible.
+        '''
+        if self.replanner is None:
+            return self.find_path(target, cost_limit)
+        return self.replanner.plan(self, objective, target, self.samaritan,
+                                   cost_limit)
+
+    def find_path(self, target, cost_limit=99999):
+        '''
+        Finds Samaritan's path to target with A*, like a_star from his head.
+
+        When paranoia sends us back, all the bad moves do is make paths that
+        start with them too expensive. So on the top level board, when there
+        are enemies to be paranoid about, the searches are kept, and the best
+        path that doesn't start with a bad move is taken from what they
+        already found, or by carrying them on from where they stopped (see
+        a_star_paths), instead of searching again.
+        '''
+        if self.mode != 0 or not self.other_snakes:
+            return a_star(self, self.samaritan.get_head(), target,
+                          self.samaritan, cost_limit)
+        search = self.path_searches.get((target, cost_limit))
+        if search is None:
+            search = self.path_searches[(target, cost_limit)] = (
+                a_star_paths(self, self.samaritan.get_head(), target,
+                             self.samaritan, cost_limit), [])
+        paths, found = search
+        for cost, path in found:
+            if self.is_allowed_path(path):
+                return (cost, path)
+        for cost, path in paths:
+            found.append((cost, path))
+            if self.is_allowed_path(path):
+                return (cost, path)
+        return (None, None)
+
+    def is_allowed_path(self, path):
+        '''Tells us whether path doesn't start with one of the bad moves.
+        '''
+        return (len(path) < 2
+                or translate(path[0], path[1]) not in self.bad_moves)
+
     def is_valid_move(self, move, distance=1, start=None):
         '''Tells us if taking a certain move with Samaritan is valid.
         '''
@@ -1114,7 +1256,8 @@ class Board(object):
         if mode == 'Risky':
             return self.height + self.width
         if mode == 'Safe':
-            return (self.height + self.width)/6
+            return ((self.height + self.width)
+                    / self.parameters['safe_food_cost_divisor'])
 
 
 
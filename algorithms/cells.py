@@ -0,0 +1,90 @@
+'''
+Boards as flat arrays of cells. The cell of node (x, y) is y * width + x, so
+the searches can keep what they've seen in bytearrays indexed by cell instead
+of hashing tuples into sets, and only turn cells back into nodes at the end.
+'''
+from array import array
+
+# (width, height): (nodes, neighbours)
+_tables = {}
+# (width, height): {direction: (step, reach)}
+_rays = {}
+# (width, height): (ranks, cells)
+_orders = {}
+
+
+def cell_tables(width, height):
+    '''
+    Returns, for a board of width by height, the node of every cell and the
+    cells next to every cell, in the same order as Board.get_neighbours looks
+    at them: right, left, down, up. They're made once per board size and
+    shared by every Board, so the nodes handed out are never allocated again.
+    '''
+    tables = _tables.get((width, height))
+    if tables is None:
+        nodes = tuple((xcoord, ycoord) for ycoord in range(height)
+                      for xcoord in range(width))
+        neighbours = []
+        for xcoord, ycoord in nodes:
+            neighbours.append(tuple(
+                ycoord * width + xcoord + offset
+                for offset, inside in ((1, xcoord + 1 < width),
+                                       (-1, xcoord > 0),
+                                       (width, ycoord + 1 < height),
+                                       (-width, ycoord > 0))
+                if inside))
+        tables = _tables[(width, height)] = (nodes, tuple(neighbours))
+    return tables
+
+def order_tables(width, height):
+    '''
+    Returns, for a board of width by height, the rank of every cell and the
+    cell of every rank, where the rank of node (x, y) is x * height + y. Ranks
+    sort like the nodes do, so a search that breaks ties by comparing paths
+    can keep its paths as lists of ranks and still pick the same path as with
+    lists of nodes.
+    '''
+    orders = _orders.get((width, height))
+    if orders is None:
+        ranks = array('i', (cell % width * height + cell // width
+                            for cell in range(width * height)))
+        cells = array('i', [0]) * (width * height)
+        for cell, rank in enumerate(ranks):
+            cells[rank] = cell
+        orders = _orders[(width, height)] = (ranks, cells)
+    return orders
+
+def ray_tables(width, height):
+    '''
+    Returns, for a board of width by height, what's needed to walk in a
+    straight line from any cell to the edge of the board, by direction:
+    (step, reach), where step is what moving that way adds to a cell and
+    reach[cell] is how many cells there are between cell and the edge. See
+    ray for the cells themselves. They're arrays, so the tables stay a few
+    KB even on big boards.
+    '''
+    rays = _rays.get((width, height))
+    if rays is None:
+        cells = range(width * height)
+        rays = _rays[(width, height)] = {
+            'right': (1, array('H', (width - 1 - cell % width
+                                     for cell in cells))),
+            'left': (-1, array('H', (cell % width for cell in cells))),
+            'down': (width, array('H', (height - 1 - cell // width
+                                        for cell in cells))),
+            'up': (-width, array('H', (cell // width for cell in cells))),
+        }
+    return rays
+
+def ray(rays, direction, cell):
+    '''
+    The cells in a straight line from cell (not included) to the edge of the
+    board in direction, nearest first, given the board's ray_tables. It's a
+    slice, so it picks the line out of anything indexed by cell (the nodes,
+    vacate times or food cells of a board) without a loop in Python.
+    '''
+    step, reach = rays[direction]
+    stop = cell + step * (reach[cell] + 1)
+    # A stop of -1 would count from the end, so going left or up to cell 0
+    # has to run to the start instead.
+    return slice(cell + step, stop if stop >= 0 else None, step)
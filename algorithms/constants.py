@@ -5,3 +5,24 @@ SAMARITAN_BODY_MARKER = '='
 ENEMY_SNAKE_HEAD_MARKER = 'S'
 ENEMY_SNAKE_BODY_MARKER = '-'
 SNAKE_TAIL_MARKER = '~'
+
+# The costs and limits Board decides moves with. They can be overridden per
+# Board, e.g. by engine.tune when searching for better values.
+DEFAULT_PARAMETERS = {
+    # Added to the cost of a node diagonally in front of a bigger snake's head
+    # (on its right hand side the cost is a bit lower).
+    'larger_head_diagonal_cost': 3,
+    'larger_head_diagonal_cost_right': 2,
+    # Added for a snake of the same size.
+    'equal_head_diagonal_cost': 1,
+    # Added to the cost of a node next to a bigger snake's head.
+    'larger_head_adjacent_cost': 6,
+    # Added to the cost of a node on the edges of the board.
+    'edge_cost': 1,
+    # Samaritan goes for food when his health is at or below this.
+    'health_limit': 40,
+    # ... or this when he's the only snake left.
+    'health_limit_alone': 70,
+    # The most a safe path to food can cost is (height + width) / this.
+    'safe_food_cost_divisor': 6,
+}
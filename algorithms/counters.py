@@ -0,0 +1,38 @@
+'''
+Opt-in counters of how much work the searches do, turned on with
+SEARCH_COUNTERS=1. Unlike timings, the counts don't depend on what else is
+running on the machine, so they show algorithmic regressions exactly.
+
+Counted:
+a_star_expanded, bfs_expanded, stall_expanded, floodfill_expanded:
+    nodes whose neighbours were looked at by each search.
+get_neighbours, is_valid_coordinate, get_cost: calls to those Board methods.
+    get_neighbour_cells counts as the four is_valid_coordinate calls it
+    stands in for, so the count compares with runs from before cells.
+sub_boards: Boards made for hypothetical positions (mode 1 and 2).
+deepcopy: deep copies of snakes and foods made by Board.
+reachability_cache_hits: tail reachability answered from the cache.
+distance_fields: distance fields made for the heuristic of A*.
+'''
+import os
+from collections import Counter
+
+ENABLED = os.environ.get('SEARCH_COUNTERS') == '1'
+
+counts = Counter()
+
+
+def count(name, amount=1):
+    '''Adds amount to the counter name.
+    '''
+    counts[name] += amount
+
+def reset():
+    '''Starts counting from zero, e.g. at the start of a move request.
+    '''
+    counts.clear()
+
+def snapshot():
+    '''Returns a copy of the counts so far.
+    '''
+    return dict(counts)
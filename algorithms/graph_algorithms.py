@@ -1,70 +1,290 @@
 from heapq import heappush, heappop
 from .utils import get_manhattan_distance, translate
+from array import array
 from collections import deque
+from . import counters
+from .cells import order_tables
 
-def a_star(board, start, target, snake, cost_limit=99999):
+# (width, height, edge cost, target cell): distance field to the target. They
+# only depend on the size of the board, so they're shared by every Board.
+distance_fields = {}
+MAX_CACHED_DISTANCE_FIELDS = 200
+
+def a_star(board, start, target, snake, cost_limit=99999, path=None):
     '''
     A pathfinding algorithm similar to djiskta's algorithm that find's the
     shortest path from start to target with the lowest cost (least dangerous)
 
     It's different to A* in that it takes into account food on the path to the
     destination and it also takes into account the dynamic nature of the game.
+
+    If path is given, it's an already planned path beginning at start and the
+    search carries on from its last node instead of from start.
+
+    The heuristic is the target's distance field (see get_distance_field)
+    rather than the manhattan distance, where the target is on the board.
+
+    The paths on the queue are lists of ranks (see order_tables), which break
+    ties between equally expensive paths the same way lists of nodes would,
+    and are only made into nodes for the path that's returned.
     '''
-    p_q = [(get_heuristic(start, target), [start],
-            get_heuristic(start, target), (1 if start in board.foods else 0))]
-    processed = set()
+    if path is None:
+        path = [start]
+    if not on_board(board, start):
+        return (None, None)
+    prefix_cost, foods_in_path = get_path_cost(board, path, snake)
+    if prefix_cost is None:
+        return (None, None)
+    width = board.width
+    nodes, food_cells = board.nodes, board.food_cells
+    ranks, rank_cells = order_tables(width, board.height)
+    field = None
+    target_rank = -1
+    if on_board(board, target):
+        field = get_distance_field(board, target)
+        target_rank = ranks[target[1] * width + target[0]]
+    path = [ranks[ycoord * width + xcoord] for xcoord, ycoord in path]
+    if field is not None:
+        heuristic = field[rank_cells[path[-1]]]
+    else:
+        heuristic = get_heuristic(nodes[rank_cells[path[-1]]], target)
+    p_q = [(prefix_cost + heuristic, path, heuristic, foods_in_path)]
+    processed = bytearray(width * board.height)
+    for rank in path[:-1]:
+        processed[rank_cells[rank]] = 1
     while p_q:
         path_cost, path, prev_heuristic, foods_in_path = heappop(p_q)
-        # if target == board.other_snakes[-1].get_tail():
-        #     print path_cost, path, foods_in_path
         if path_cost > cost_limit:
             continue
-        curr_node = path[-1]
-        processed.add(curr_node)
-        if curr_node == target:
-            return (path_cost, path)
-        neighbours = board.get_neighbours(curr_node, snake, len(path),
-                                          foods_in_path)
+        curr_cell = rank_cells[path[-1]]
+        processed[curr_cell] = 1
+        if path[-1] == target_rank:
+            return (path_cost, [nodes[rank_cells[rank]] for rank in path])
+        if counters.ENABLED:
+            counters.count('a_star_expanded')
+        neighbours = board.get_neighbour_cells(curr_cell, len(path),
+                                               foods_in_path)
         for neighbour in neighbours:
-            if not neighbour in processed:
-                new_cost = (get_heuristic(neighbour, target) + board.get_cost(
-                                neighbour, snake, len(path), foods_in_path) +
+            if not processed[neighbour]:
+                if field is not None:
+                    curr_heuristic = field[neighbour]
+                else:
+                    curr_heuristic = get_heuristic(nodes[neighbour], target)
+                new_cost = (curr_heuristic + board.get_cost(
+                                nodes[neighbour], snake, len(path),
+                                foods_in_path) +
                                 (path_cost - prev_heuristic))
-                new_path = path + [neighbour]
-                curr_heuristic = get_heuristic(neighbour, target)
-                foods = (1 + foods_in_path if neighbour in board.foods
-                         else foods_in_path)
-                heappush(p_q, (new_cost, new_path, curr_heuristic, foods))
+                heappush(p_q, (new_cost, path + [ranks[neighbour]],
+                               curr_heuristic,
+                               foods_in_path + food_cells[neighbour]))
     return (None, None)
 
+def a_star_paths(board, start, target, snake, cost_limit=99999):
+    '''
+    Yields the paths a_star finds from start to target, one per first move:
+    first what a_star returns, then the best path that starts with a
+    different move, and so on. Each is (cost, path) like a_star returns.
+
+    The search is only carried on when the next path is asked for, from
+    where it stopped. The nodes only reached through the moves already
+    yielded are opened again, and extended from the nodes reached through
+    the other moves, instead of searching from scratch.
+
+    Like a_star, the paths on the queue are lists of ranks.
+    '''
+    if not on_board(board, start):
+        return
+    width = board.width
+    nodes, food_cells = board.nodes, board.food_cells
+    ranks, rank_cells = order_tables(width, board.height)
+    field = None
+    target_rank = -1
+    if on_board(board, target):
+        field = get_distance_field(board, target)
+        target_rank = ranks[target[1] * width + target[0]]
+    def heuristic(cell):
+        if field is not None:
+            return field[cell]
+        return get_heuristic(nodes[cell], target)
+    def push(entry, reopened=None):
+        path_cost, path, prev_heuristic, foods_in_path = entry
+        neighbours = board.get_neighbour_cells(rank_cells[path[-1]],
+                                               len(path), foods_in_path)
+        for neighbour in neighbours:
+            rank = ranks[neighbour]
+            if not rank in processed and (reopened is None
+                                          or rank in reopened):
+                curr_heuristic = heuristic(neighbour)
+                new_cost = (curr_heuristic + board.get_cost(
+                                nodes[neighbour], snake, len(path),
+                                foods_in_path) +
+                                (path_cost - prev_heuristic))
+                heappush(p_q, (new_cost, path + [rank], curr_heuristic,
+                               foods_in_path + food_cells[neighbour]))
+    start_cell = start[1] * width + start[0]
+    first_heuristic = heuristic(start_cell)
+    p_q = [(first_heuristic, [ranks[start_cell]], first_heuristic,
+            food_cells[start_cell])]
+    # rank: the entries it was expanded from
+    processed = {}
+    # The ranks of the first steps of the paths yielded.
+    yielded = set()
+    while True:
+        found = None
+        while p_q:
+            entry = heappop(p_q)
+            path_cost, path = entry[:2]
+            if path_cost > cost_limit:
+                continue
+            if len(path) > 1 and path[1] in yielded:
+                continue
+            curr_rank = path[-1]
+            processed.setdefault(curr_rank, []).append(entry)
+            if curr_rank == target_rank:
+                found = (path_cost, path)
+                break
+            if counters.ENABLED:
+                counters.count('a_star_expanded')
+            push(entry)
+        if found is None:
+            return
+        path_cost, path = found
+        yield (path_cost, [nodes[rank_cells[rank]] for rank in path])
+        if len(path) == 1:
+            return
+        yielded.add(path[1])
+        reopened = set()
+        for rank in list(processed):
+            entries = [entry for entry in processed[rank]
+                       if len(entry[1]) == 1 or entry[1][1] not in yielded]
+            if entries:
+                processed[rank] = entries
+            else:
+                del processed[rank]
+                reopened.add(rank)
+        # The other moves' paths to the reopened nodes were never pushed, as
+        # the nodes were taken when they were expanded.
+        for entries in list(processed.values()):
+            for entry in entries:
+                push(entry, reopened)
+
+def get_path_cost(board, path, snake):
+    '''
+    Returns the cost a_star would give path (without the heuristic) along with
+    the number of foods on it. Returns (None, None) if any node on the path is
+    no longer valid by the time snake gets to it.
+    '''
+    cost = 0
+    foods_in_path = 1 if path[0] in board.foods else 0
+    for distance, node in enumerate(path[1:], 1):
+        if not board.is_valid_coordinate(node[0], node[1], snake, distance,
+                                         foods_in_path):
+            return (None, None)
+        cost += board.get_cost(node, snake, distance, foods_in_path)
+        if node in board.foods:
+            foods_in_path += 1
+    return (cost, foods_in_path)
+
 def stall(board):
     '''An algorithm that is used as a last resort by Samaritan when it's trapped
     Sometimes it's also used when A* can't find a way out, but there is, infact,
     a way out.
+
+    Like a_star, the paths on the queue are lists of ranks (see order_tables).
     '''
+    head = board.samaritan.get_head()
+    if not on_board(board, head):
+        return (None, None)
+    width, height = board.width, board.height
+    ranks, rank_cells = order_tables(width, height)
     possible_routes = []
-    neighbours_of_samaritan = board.get_neighbours(board.samaritan.get_head(),
-                                                   board.samaritan)
-    for neighbour in neighbours_of_samaritan:
-        heappush(possible_routes, (1, [neighbour], set([neighbour])))
+    for neighbour in board.get_neighbour_cells(head[1] * width + head[0]):
+        # The cells seen on the paths that start with this move.
+        visited_cells = bytearray(width * height)
+        visited_cells[neighbour] = 1
+        heappush(possible_routes, (1, [ranks[neighbour]], visited_cells))
     if not possible_routes:
         return (None, None)
     while possible_routes:
-        length_of_path, path, visited_nodes = heappop(possible_routes)
-        neighbours_of_node = board.get_neighbours(path[-1], board.samaritan,
-                                                  length_of_path)
+        length_of_path, path, visited_cells = heappop(possible_routes)
+        if counters.ENABLED:
+            counters.count('stall_expanded')
+        neighbours_of_node = board.get_neighbour_cells(rank_cells[path[-1]],
+                                                       length_of_path)
         for neighbour in neighbours_of_node:
-            if neighbour not in visited_nodes:
-                visited_nodes.add(neighbour)
-                heappush(possible_routes, (length_of_path+1, path + [neighbour],
-                                           visited_nodes))
-    return ('Stalling', translate(board.samaritan.get_head(), path[0]))
+            if not visited_cells[neighbour]:
+                visited_cells[neighbour] = 1
+                heappush(possible_routes, (length_of_path+1,
+                                           path + [ranks[neighbour]],
+                                           visited_cells))
+    return ('Stalling', translate(head, board.nodes[rank_cells[path[0]]]))
 
 def get_heuristic(curr_node, target):
     '''Returns the heuristic cost for A*
     '''
     return get_manhattan_distance(curr_node, target)
 
+def get_distance_field(board, target):
+    '''
+    Returns the least every cell (see cells.py) can cost to get from to
+    target, for the heuristic of A*. Every step costs at least 1, and at
+    least 1 + edge_cost onto a node on the edge of the board, whatever the
+    snakes do, so a search backwards from target over the empty board with
+    those costs gives a heuristic that never overestimates and that's never
+    below the manhattan distance. It's a lot closer along the edges, where
+    the manhattan distance ignores the edge cost.
+
+    Fields are made the first time a target is asked for on a board of that
+    size and kept for every later search, of any Board.
+    '''
+    width, height = board.width, board.height
+    edge_cost = board.parameters['edge_cost']
+    target_cell = target[1] * width + target[0]
+    key = (width, height, edge_cost, target_cell)
+    field = distance_fields.get(key)
+    if field is not None:
+        return field
+    if counters.ENABLED:
+        counters.count('distance_fields')
+    if len(distance_fields) >= MAX_CACHED_DISTANCE_FIELDS:
+        distance_fields.clear()
+    nodes, cell_neighbours = board.nodes, board.cell_neighbours
+    # Rounded down, so the field still never overestimates if the edge cost
+    # isn't a whole number.
+    edge_step = int(max(0, 1 + edge_cost))
+    field = array('i', [-1]) * (width * height)
+    field[target_cell] = 0
+    # Dijkstra with a bucket of cells per distance (the costs are small whole
+    # numbers), which keeps a lot less in memory than a heap of tuples.
+    buckets = [[target_cell]]
+    distance = 0
+    while distance < len(buckets):
+        bucket = buckets[distance]
+        index = 0
+        # Steps onto the edge can cost nothing, which adds to this bucket.
+        while index < len(bucket):
+            cell = bucket[index]
+            index += 1
+            if field[cell] != distance:
+                continue
+            # What it costs to step onto cell from any of its neighbours.
+            xcoord, ycoord = nodes[cell]
+            if (xcoord == 0 or ycoord == 0 or xcoord == width - 1
+                or ycoord == height - 1):
+                next_distance = distance + edge_step
+            else:
+                next_distance = distance + 1
+            for neighbour in cell_neighbours[cell]:
+                if field[neighbour] == -1 or next_distance < field[neighbour]:
+                    field[neighbour] = next_distance
+                    while len(buckets) <= next_distance:
+                        buckets.append([])
+                    buckets[next_distance].append(neighbour)
+        buckets[distance] = None
+        distance += 1
+    distance_fields[key] = field
+    return field
+
 '''Bottom 2 functions are not currently being used however they may be helpful
 in the future'''
 
@@ -84,36 +304,100 @@ in the future'''
 def advanced_floodfill(board, node, snake, distance_to_node=0, foods=0):
     '''Advanced version accounts for moving snakes
     '''
-    processed = set()
-    start = snake.get_head()
-    to_be_processed = [(snake.get_head(), 0)]
+    if not on_board(board, snake.get_head()):
+        return 0
+    processed = bytearray(board.width * board.height)
+    count = 0
+    xcoord, ycoord = snake.get_head()
+    to_be_processed = [(ycoord * board.width + xcoord, 0)]
     while to_be_processed:
-        curr_node, length_of_path = to_be_processed.pop()
-        processed.add(curr_node)
-        neighbours = board.get_neighbours(curr_node, snake, length_of_path+1)
+        curr_cell, length_of_path = to_be_processed.pop()
+        if not processed[curr_cell]:
+            processed[curr_cell] = 1
+            count += 1
+        if counters.ENABLED:
+            counters.count('floodfill_expanded')
+        neighbours = board.get_neighbour_cells(curr_cell, length_of_path+1)
         for neighbour in neighbours:
-            if neighbour not in processed:
+            if not processed[neighbour]:
                 to_be_processed.append((neighbour, length_of_path+1))
-    return len(processed) - 1
+    return count - 1
 
 def bfs(board, start, target, snake):
     '''
     Uses bfs to see if a path is available from start to target. Returns
     true if a path exists, else false.
+
+    The search is done on cells (see cells.py), remembering the cell each
+    cell was found from, and the path is only made into nodes at the end.
     '''
-    queue = deque([(0, [start], (1 if start in board.foods else 0))])
-    processed = set([start])
+    if not (on_board(board, start) and on_board(board, target)):
+        return (None, None)
+    width = board.width
+    start_cell = start[1] * width + start[0]
+    target_cell = target[1] * width + target[0]
+    food_cells = board.food_cells
+    queue = deque([(start_cell, 0, food_cells[start_cell])])
+    found_from = array('i', [-1]) * (width * board.height)
+    processed = bytearray(width * board.height)
+    processed[start_cell] = 1
     while queue:
-        length_of_path, path, foods_in_path = queue.popleft()
-        curr_node = path[-1]
-        if curr_node == target:
+        curr_cell, length_of_path, foods_in_path = queue.popleft()
+        if curr_cell == target_cell:
+            path = []
+            while curr_cell != -1:
+                path.append(board.nodes[curr_cell])
+                curr_cell = found_from[curr_cell]
+            path.reverse()
             return (length_of_path, path)
-        neighbours = board.get_neighbours(curr_node, snake, length_of_path+1,
-                                          foods_in_path)
+        if counters.ENABLED:
+            counters.count('bfs_expanded')
+        neighbours = board.get_neighbour_cells(curr_cell, length_of_path+1,
+                                               foods_in_path)
         for neighbour in neighbours:
-            if not neighbour in processed:
-                processed.add(neighbour)
-                queue.append((length_of_path+1, path + [neighbour],
-                             (1 + foods_in_path if neighbour in board.foods
-                                                else foods_in_path)))
+            if not processed[neighbour]:
+                processed[neighbour] = 1
+                found_from[neighbour] = curr_cell
+                queue.append((neighbour, length_of_path+1,
+                              foods_in_path + food_cells[neighbour]))
     return (None, None)
+
+def is_reachable(board, start, target, snake):
+    '''
+    Tells us whether bfs would find a path from start to target, without
+    keeping the paths. Nodes are visited in the same order and with the same
+    distances and foods as in bfs, so the answer is always the same, but the
+    search stops as soon as target is found rather than when it comes off the
+    queue.
+    '''
+    if start == target:
+        return True
+    if not (on_board(board, start) and on_board(board, target)):
+        return False
+    width = board.width
+    start_cell = start[1] * width + start[0]
+    target_cell = target[1] * width + target[0]
+    food_cells = board.food_cells
+    queue = deque([(start_cell, 0, food_cells[start_cell])])
+    processed = bytearray(width * board.height)
+    processed[start_cell] = 1
+    while queue:
+        curr_cell, length_of_path, foods_in_path = queue.popleft()
+        if counters.ENABLED:
+            counters.count('bfs_expanded')
+        neighbours = board.get_neighbour_cells(curr_cell, length_of_path+1,
+                                               foods_in_path)
+        for neighbour in neighbours:
+            if not processed[neighbour]:
+                if neighbour == target_cell:
+                    return True
+                processed[neighbour] = 1
+                queue.append((neighbour, length_of_path+1,
+                              foods_in_path + food_cells[neighbour]))
+    return False
+
+def on_board(board, node):
+    '''Tells us whether node is on the board, i.e. has a cell.
+    '''
+    xcoord, ycoord = node
+    return -1 < xcoord < board.width and -1 < ycoord < board.height
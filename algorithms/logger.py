@@ -0,0 +1,167 @@
+'''
+A small logger that keeps printing out of the time it takes to get a move.
+
+Log calls only append a record to an in-memory ring buffer. Formatting and
+printing are done in batches by a background thread, so the message and its
+arguments (e.g. a GridDump) are only turned into text once they are actually
+written out. If the buffer fills up faster than it's flushed, the oldest
+records are dropped. Other slow work that shouldn't hold up a request, like
+writing a profile, can be handed to the same thread with defer.
+
+The level is set with the LOG_LEVEL environment variable (DEBUG, INFO,
+WARNING or ERROR). It defaults to INFO.
+'''
+import atexit
+import os
+import sys
+from collections import deque
+from threading import Lock, Thread
+from time import time, sleep, strftime, localtime
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+LEVEL = {name: level for level, name in LEVEL_NAMES.items()}.get(
+    os.environ.get('LOG_LEVEL', 'INFO').upper(), INFO)
+BUFFER_SIZE = int(os.environ.get('LOG_BUFFER_SIZE', 10000))
+# How often, in seconds, the background thread writes out the buffer.
+FLUSH_INTERVAL = 0.25
+
+_records = deque(maxlen=BUFFER_SIZE)
+# (function, args) to call on the next flush
+_tasks = deque()
+_write_lock = Lock()
+_flusher = None
+
+
+class GridDump(object):
+    '''
+    Wraps a board's grid so that it's only drawn when the log record holding
+    it is written out.
+    '''
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def __str__(self):
+        return '\n'.join(' '.join(row) for row in self.grid) + '\n'
+
+
+def is_enabled(level):
+    '''Tells us whether records at level are being logged.
+    '''
+    return level >= LEVEL
+
+def log(level, message, *args, **fields):
+    '''
+    Buffers a record. The message is formatted with args (% style) and the
+    fields are written after it as key=value pairs, but only when the record
+    is flushed.
+    '''
+    if level < LEVEL:
+        return
+    _records.append((time(), level, message, args, fields))
+    if _flusher is None:
+        _start_flusher()
+
+def debug(message, *args, **fields):
+    log(DEBUG, message, *args, **fields)
+
+def info(message, *args, **fields):
+    log(INFO, message, *args, **fields)
+
+def warning(message, *args, **fields):
+    log(WARNING, message, *args, **fields)
+
+def error(message, *args, **fields):
+    log(ERROR, message, *args, **fields)
+
+def defer(function, *args):
+    '''
+    Has the background thread call function(*args) on its next flush, so
+    the caller doesn't wait for it.
+    '''
+    _tasks.append((function, args))
+    if _flusher is None:
+        _start_flusher()
+
+def flush():
+    '''
+    Formats every buffered record and writes them out in one go, then does
+    the deferred work.
+    '''
+    with _write_lock:
+        lines = []
+        while _records:
+            lines.append(_format(_records.popleft()))
+        if lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
+            sys.stdout.flush()
+        tasks = []
+        while _tasks:
+            tasks.append(_tasks.popleft())
+    for function, args in tasks:
+        try:
+            function(*args)
+        except Exception as exception:
+            error("Deferred work failed", function=function.__name__,
+                  error=repr(exception))
+
+def _format(record):
+    '''Turns a record into a line of text.
+    '''
+    timestamp, level, message, args, fields = record
+    try:
+        text = message % args if args else message
+    except (TypeError, ValueError):
+        text = '{} {}'.format(message, args)
+    if fields:
+        text += ' ' + ' '.join('{}={}'.format(key, _format_value(fields[key]))
+                               for key in sorted(fields))
+    return '{}.{:03d} {} {}'.format(strftime('%H:%M:%S', localtime(timestamp)),
+                                    int(timestamp * 1000) % 1000,
+                                    LEVEL_NAMES[level], text)
+
+def _format_value(value):
+    '''Shortens floats (timings, mostly) to 3 decimal places.
+    '''
+    if isinstance(value, float):
+        return '{:.3f}'.format(value)
+    return value
+
+def _flush_forever():
+    '''Runs in the background thread.
+    '''
+    while True:
+        sleep(FLUSH_INTERVAL)
+        flush()
+
+def _start_flusher():
+    '''Starts the background thread that writes out the buffer.
+    '''
+    global _flusher
+    with _write_lock:
+        if _flusher is not None:
+            return
+        _flusher = Thread(target=_flush_forever, name='logger')
+        _flusher.daemon = True
+        _flusher.start()
+
+def after_fork():
+    '''
+    A forked child doesn't have the parent's thread, so it needs its own,
+    and a lock the thread can't have been holding when the parent forked.
+    '''
+    global _flusher, _write_lock
+    _flusher = None
+    _write_lock = Lock()
+    _records.clear()
+    _tasks.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=after_fork)
+atexit.register(flush)
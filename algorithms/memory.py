@@ -0,0 +1,79 @@
+'''
+Opt-in tracking of the memory each strategy uses, turned on with
+MEMORY_TRACKING=1. It runs everything under tracemalloc, which makes moves a
+lot slower, so it's meant for benchmarks.memory_budget and for debugging, not
+for games.
+
+For every strategy on a move we keep:
+peak_bytes: the most memory allocated at once while it ran, above what was
+    allocated when it started.
+net_blocks: memory blocks it allocated and didn't free, e.g. the sub-Boards
+    and copies it kept.
+calls: how many times it ran.
+
+Strategies can run inside others (paranoia runs the enemies' strategies), so
+the peak of an outer strategy includes those of the ones inside it. Before
+Python 3.9 tracemalloc can't reset its peak, so peaks are only upper bounds.
+'''
+import os
+import sys
+import tracemalloc
+
+ENABLED = os.environ.get('MEMORY_TRACKING') == '1'
+
+usage = {}
+# Strategies that are running, innermost last. Each is
+# [memory at the start, highest peak seen, blocks at the start].
+_running = []
+
+
+def begin():
+    '''
+    Starts measuring a strategy. Returns the token to pass to end when it's
+    done.
+    '''
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    current, peak = tracemalloc.get_traced_memory()
+    for frame in _running:
+        frame[1] = max(frame[1], peak)
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    frame = [current, current, sys.getallocatedblocks()]
+    _running.append(frame)
+    return frame
+
+def end(strategy, token):
+    '''
+    Stops measuring the strategy begin returned token for, and adds what it
+    used to usage. Returns (peak bytes, net blocks).
+    '''
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = sys.getallocatedblocks()
+    if token in _running:
+        # Strategies that were begun but never ended end here too.
+        del _running[_running.index(token):]
+    for frame in _running:
+        frame[1] = max(frame[1], peak)
+    start, highest, start_blocks = token
+    peak_bytes = max(highest, peak) - start
+    net_blocks = blocks - start_blocks
+    strategy_usage = usage.setdefault(strategy, {'peak_bytes': 0,
+                                                 'net_blocks': 0, 'calls': 0})
+    strategy_usage['peak_bytes'] = max(strategy_usage['peak_bytes'],
+                                       peak_bytes)
+    strategy_usage['net_blocks'] += net_blocks
+    strategy_usage['calls'] += 1
+    return peak_bytes, net_blocks
+
+def reset():
+    '''Starts again from nothing, e.g. at the start of a move request.
+    '''
+    usage.clear()
+    del _running[:]
+
+def snapshot():
+    '''Returns a copy of the usage of every strategy so far.
+    '''
+    return {strategy: dict(strategy_usage)
+            for strategy, strategy_usage in usage.items()}
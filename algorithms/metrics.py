@@ -0,0 +1,139 @@
+'''
+In-process metrics, rendered in the Prometheus text format for /metrics.
+
+Recording a value is a dictionary lookup and a few additions under a lock,
+so it's cheap enough to do for every strategy on every move.
+'''
+import os
+from bisect import bisect_left
+from threading import Lock
+
+# Upper bounds of the histogram buckets for timings, in milliseconds.
+TIME_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+RETRY_BUCKETS = (0, 1, 2, 3)
+WORK_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+
+# name: (type, help text, buckets)
+METRICS = {
+    'samaritan_move_ms': ('histogram',
+        'Time taken to answer a move request, in milliseconds.', TIME_BUCKETS),
+    'samaritan_strategy_ms': ('histogram',
+        'Time taken by each strategy in get_action, in milliseconds.',
+        TIME_BUCKETS),
+    'samaritan_bad_move_retries': ('histogram',
+        'Number of times paranoia made get_action look for another move.',
+        RETRY_BUCKETS),
+    'samaritan_search_work': ('histogram',
+        'Work done by the searches per move request, by counter '
+        '(only with SEARCH_COUNTERS=1).', WORK_BUCKETS),
+    'samaritan_objective_total': ('counter',
+        'Number of moves decided by each objective.', None),
+    'samaritan_gate_total': ('counter',
+        'Number of times the precheck of each strategy let it run '
+        '(passed="true") or skipped it.', None),
+    'samaritan_gate_saved_ms': ('counter',
+        'Estimated time saved by skipping strategies, in milliseconds: what '
+        'they took on average when they did run.', None),
+    'samaritan_paranoia_pruned_total': ('counter',
+        'Number of unlikely enemy replies paranoia left out because it was '
+        'running out of time.', None),
+}
+
+_lock = Lock()
+_histograms = {}
+_counters = {}
+
+
+def observe(name, value, **labels):
+    '''Records value in the histogram name.
+    '''
+    buckets = METRICS[name][2]
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(buckets) + 1), 0, 0]
+        histogram[0][bisect_left(buckets, value)] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+def increment(name, amount=1, **labels):
+    '''Adds amount to the counter name.
+    '''
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def mean(name, **labels):
+    '''Returns the mean of the values in the histogram name, None if empty.
+    '''
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None or histogram[2] == 0:
+            return None
+        return histogram[1] / histogram[2]
+
+def board_size(board):
+    '''Returns the label used for the size of a board e.g. 11x11.
+    '''
+    return '{}x{}'.format(board.width, board.height)
+
+def reset():
+    '''Forgets everything recorded so far.
+    '''
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+def after_fork():
+    '''
+    Starts a forked process off with a lock of its own and nothing recorded.
+    The parent's lock may have been held by one of its other threads when it
+    forked, and nobody would ever release it in the child.
+    '''
+    global _lock
+    _lock = Lock()
+    _histograms.clear()
+    _counters.clear()
+
+def render():
+    '''Returns every metric in the Prometheus text exposition format.
+    '''
+    with _lock:
+        histograms = {key: (counts[:], total, count)
+                      for key, (counts, total, count) in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    for name in sorted(METRICS):
+        kind, help_text, buckets = METRICS[name]
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} {}'.format(name, kind))
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append('{}{} {}'.format(name, _labels(labels), value))
+            continue
+        for (metric, labels), (counts, total, count) in sorted(
+                histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append('{}_bucket{} {}'.format(
+                    name, _labels(labels + (('le', bound),)), cumulative))
+            lines.append('{}_sum{} {}'.format(name, _labels(labels), total))
+            lines.append('{}_count{} {}'.format(name, _labels(labels), count))
+    return '\n'.join(lines) + '\n'
+
+def _labels(labels):
+    '''Formats label pairs as {key="value",...}.
+    '''
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(key, str(value).replace(
+        '\\', '\\\\').replace('"', '\\"')) for key, value in labels) + '}'
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=after_fork)
@@ -0,0 +1,146 @@
+'''
+What each enemy tends to do, learnt from the moves he made earlier in the
+game, so paranoia can look at his likely replies first.
+
+Every move an enemy could make is described by a few traits: whether it
+takes him closer to food, closer to Samaritan, onto an edge, or keeps him
+going straight. Each turn, for every trait where he had the choice (some of
+his moves had it and some didn't), we count whether he took a move with it.
+How likely a reply is, is then the product over the traits he has a choice
+on now of how often he went for (or against) them, counted from one each way
+so a snake we haven't seen yet gets every reply equally.
+'''
+from .utils import get_manhattan_distance
+from .traps import edge
+
+FOOD = 'food'
+AGGRESSIVE = 'aggressive'
+EDGE = 'edge'
+STRAIGHT = 'straight'
+TRAITS = (FOOD, AGGRESSIVE, EDGE, STRAIGHT)
+
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+# Replies less likely than this are left out of paranoia when it's running
+# out of time.
+UNLIKELY = 0.15
+
+
+def traits(body, node, foods, target, width, height):
+    '''
+    The traits of the snake with body moving his head to node, with the foods
+    on the board and Samaritan's head at target.
+    '''
+    head = body[0]
+    found = set()
+    if foods:
+        if (min(get_manhattan_distance(node, food) for food in foods)
+                < min(get_manhattan_distance(head, food) for food in foods)):
+            found.add(FOOD)
+    if (target is not None and get_manhattan_distance(node, target)
+            < get_manhattan_distance(head, target)):
+        found.add(AGGRESSIVE)
+    if edge(node, width, height) is not None:
+        found.add(EDGE)
+    if (len(body) > 1 and body[1] != head
+            and (node[0] - head[0], node[1] - head[1])
+            == (head[0] - body[1][0], head[1] - body[1][1])):
+        found.add(STRAIGHT)
+    return found
+
+
+class OpponentModel(object):
+    '''
+    What the enemies in one game have done so far. Lives for the length of
+    the game, like a Replanner, and is shown every move request with observe.
+    '''
+
+    def __init__(self):
+        '''Starts with nothing seen.
+        '''
+        # snake id: {trait: [times he had the choice, times he took it]}
+        self.choices = {}
+        self.previous = None
+
+    def observe(self, data):
+        '''
+        Learns from the moves the enemies made since the last move request
+        (a 2019 API move request). Turns that weren't the very next one are
+        only remembered, as we can't tell what moves were made in between.
+        '''
+        previous, self.previous = self.previous, data
+        if previous is None:
+            return
+        turn, previous_turn = data.get('turn'), previous.get('turn')
+        if turn is None or previous_turn is None or turn != previous_turn + 1:
+            return
+        you = data['you']['id']
+        width = previous['board']['width']
+        height = previous['board']['height']
+        foods = [(point['x'], point['y'])
+                 for point in previous['board']['food']]
+        bodies = {snake['id']: [(point['x'], point['y'])
+                                for point in snake['body']]
+                  for snake in previous['board']['snakes']}
+        target = bodies[you][0] if you in bodies else None
+        # Where a snake couldn't have moved: every body but the tails.
+        blocked = set()
+        for body in bodies.values():
+            blocked.update(body[:-1])
+        for snake in data['board']['snakes']:
+            body = bodies.get(snake['id'])
+            if snake['id'] == you or not body or not snake['body']:
+                continue
+            head = body[0]
+            taken = (snake['body'][0]['x'], snake['body'][0]['y'])
+            options = []
+            for dx, dy in DIRECTIONS:
+                node = (head[0] + dx, head[1] + dy)
+                if (-1 < node[0] < width and -1 < node[1] < height
+                        and node not in blocked):
+                    options.append(node)
+            if taken not in options:
+                continue
+            self.learn(snake['id'], [
+                (traits(body, node, foods, target, width, height),
+                 node == taken) for node in options])
+
+    def learn(self, snake_id, options):
+        '''
+        Counts the choice a snake made, given (traits, whether he took it) for
+        every move he could have made.
+        '''
+        counts = self.choices.setdefault(snake_id, {})
+        for trait in TRAITS:
+            offered = set(trait in found for found, _ in options)
+            if len(offered) < 2:
+                continue
+            tally = counts.setdefault(trait, [0, 0])
+            tally[0] += 1
+            if any(trait in found for found, took in options if took):
+                tally[1] += 1
+
+    def rank(self, snake, nodes, foods, target, width, height):
+        '''
+        Returns [(likelihood, node)] for the nodes snake could move his head
+        to, most likely first. The likelihoods add up to one. Equally likely
+        nodes keep their order.
+        '''
+        if not nodes:
+            return []
+        counts = self.choices.get(snake.id, {})
+        found = [traits(snake.coordinates, node, foods, target, width, height)
+                 for node in nodes]
+        weights = [1.0] * len(nodes)
+        for trait in TRAITS:
+            offered = [trait in node_traits for node_traits in found]
+            if all(offered) or not any(offered):
+                continue
+            choices, took = counts.get(trait, (0, 0))
+            likelihood = (took + 1.0) / (choices + 2.0)
+            for index, has_trait in enumerate(offered):
+                weights[index] *= likelihood if has_trait else 1 - likelihood
+        total = sum(weights)
+        ranked = [(weight / total, index)
+                  for index, weight in enumerate(weights)]
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return [(likelihood, nodes[index]) for likelihood, index in ranked]
@@ -0,0 +1,166 @@
+import os
+import sys
+from itertools import product
+from multiprocessing import Process, Pipe
+from threading import Lock, Thread
+from .board import Board
+from .snapshot import Snapshot
+from . import logger, metrics
+
+# The most boards we speculatively evaluate after a single move.
+MAX_PONDERED_BOARDS = 32
+
+def board_key(data):
+    '''
+    Returns a hashable key for a board in the 2019 API format. Two requests
+    with the same key get the same move from Board.get_action. It's the key
+    of the request's Snapshot, so pondered snapshots can be looked up by it.
+    '''
+    return Snapshot.from_data(data).key()
+
+def likely_next_boards(snapshot, move):
+    '''
+    Given the board Samaritan just moved on (as a Snapshot) and the move he
+    sent, yields snapshots of the boards the next request is likely to be
+    for. Every enemy reply to the move is enumerated, the replies that look
+    the safest for each enemy first, up to MAX_PONDERED_BOARDS boards. Each
+    snapshot is made with Snapshot.advance, so only the bodies are copied
+    and no Board is built for it here.
+    '''
+    board = Board(snapshot.to_data(), 1)
+    replies = []
+    for snake in board.other_snakes:
+        neighbours = board.get_neighbours(snake.get_head(), snake)
+        neighbours.sort(key=lambda node: board.get_cost(node, snake, 1, 0))
+        if not neighbours:
+            neighbours = [None]
+        replies.append(neighbours)
+    head_x, head_y = board.samaritan.get_head()
+    samaritan_node = {
+        'up': (head_x, head_y-1),
+        'down': (head_x, head_y+1),
+        'left': (head_x-1, head_y),
+        'right': (head_x+1, head_y)
+    }[move]
+    for count, enemy_nodes in enumerate(product(*replies)):
+        if count == MAX_PONDERED_BOARDS:
+            return
+        moves = {snake.id: node
+                 for snake, node in zip(board.other_snakes, enemy_nodes)}
+        moves[board.samaritan.id] = samaritan_node
+        yield snapshot.advance(moves)
+
+def _ponder(snapshot, move, connection):
+    '''
+    Runs in the pondering process. Evaluates every likely next board and
+    sends (key, (objective, move)) back for each as soon as it's done.
+    '''
+    sys.stdout = open(os.devnull, 'w')
+    # We were forked from a thread while the request thread may have been
+    # holding these locks. Python 3.7+ does this through os.register_at_fork
+    # as well, but 3.6 doesn't have it.
+    metrics.after_fork()
+    logger.after_fork()
+    for next_snapshot in likely_next_boards(snapshot, move):
+        try:
+            result = Board(next_snapshot.to_data()).get_action()
+        except Exception:
+            continue
+        connection.send((next_snapshot.key(), result))
+    connection.close()
+
+
+class Ponderer(object):
+    '''
+    Thinks about the next move while the game server is waiting on the other
+    snakes. After Samaritan answers a move request, the boards the next
+    request is likely to be for are evaluated in a separate process (so we
+    never compete with a request for the GIL) and the answers are cached by
+    board_key.
+
+    Pondering is always cancelled before a request is answered, and anything
+    finished by then is kept.
+    '''
+
+    def __init__(self):
+        '''Initializes the ponderer with nothing cached or running.
+        '''
+        self.cache = {}
+        self.process = None
+        self.connection = None
+        self.generation = 0
+        self.lock = Lock()
+
+    def start(self, data, move):
+        '''
+        Starts pondering on the boards likely to follow Samaritan making move
+        on data. Anything still being pondered is cancelled first. The work is
+        handed to a thread, so this returns straight away.
+        '''
+        with self.lock:
+            generation = self.generation
+        thread = Thread(target=self._start, args=(data, move, generation))
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self):
+        '''Stops pondering, keeping whatever was already worked out.
+        '''
+        with self.lock:
+            self.generation += 1
+            self._stop()
+
+    def lookup(self, data):
+        '''
+        Cancels pondering and returns the cached (objective, move) for data, or
+        None if the board wasn't pondered.
+        '''
+        self.cancel()
+        return self.cache.get(board_key(data))
+
+    def _start(self, data, move, generation):
+        '''
+        Starts the pondering process, unless a request came in since start was
+        called. The lock is only held to swap the process in, so a request
+        never waits on the fork.
+        '''
+        with self.lock:
+            if generation != self.generation:
+                return
+            self._stop()
+            self.cache = {}
+        receiver, sender = Pipe(duplex=False)
+        process = Process(target=_ponder,
+                          args=(Snapshot.from_data(data), move, sender))
+        process.daemon = True
+        process.start()
+        sender.close()
+        with self.lock:
+            if generation == self.generation:
+                # In case another start got in between.
+                self._stop()
+                self.process = process
+                self.connection = receiver
+                return
+        # A request came in while the process was starting.
+        process.terminate()
+        process.join()
+        receiver.close()
+
+    def _stop(self):
+        '''Collects finished results and kills the pondering process.
+        '''
+        if self.process is None:
+            return
+        try:
+            while self.connection.poll():
+                key, result = self.connection.recv()
+                self.cache[key] = result
+        except (EOFError, OSError):
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.connection.close()
+        self.process = None
+        self.connection = None
@@ -0,0 +1,128 @@
+'''
+A sampling profiler for move requests, so we can see where the time goes on
+the positions that are slow in real games.
+
+Set PROFILE_RATE to the fraction of move requests to profile (e.g. 0.05), or
+send a request with the header X-Samaritan-Profile: 1 to profile that one.
+Profiles are written to PROFILE_DIR (profiles by default), one JSON file per
+request tagged with the game id, turn and board size.
+
+While a request is profiled, a background thread looks at the stack of the
+thread answering it every PROFILE_INTERVAL seconds and counts each distinct
+stack. This costs far less than tracing every call, so the timings of the
+profiled request stay close to those of the others. The stacks are stored as
+collapsed stacks ("frame;frame;frame": samples) which benchmarks.profiles
+merges into a flame graph.
+'''
+import json
+import os
+import random
+import sys
+from collections import Counter
+from threading import Event, Thread, get_ident
+from time import time
+from . import logger
+
+RATE = float(os.environ.get('PROFILE_RATE', 0))
+DIRECTORY = os.environ.get('PROFILE_DIR', 'profiles')
+# Python switches threads every 5ms by default, so sampling more often than
+# that mostly takes the same sample again.
+INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+HEADER = 'X-Samaritan-Profile'
+
+
+class Sampler(object):
+    '''Counts the stacks of a thread while it calls a function.
+    '''
+
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.elapsed_ms = 0.0
+
+    def run(self, function, *args, **kwargs):
+        '''
+        Calls function, sampling the stack of this thread below the call
+        until it returns. Returns what function returns.
+        '''
+        thread_id = get_ident()
+        done = Event()
+        sampler = Thread(target=self._sample, args=(thread_id, done),
+                         name='profiler')
+        sampler.daemon = True
+        start = time()
+        sampler.start()
+        try:
+            return _call(function, args, kwargs)
+        finally:
+            done.set()
+            sampler.join()
+            self.elapsed_ms = (time() - start) * 1000
+
+    def _sample(self, thread_id, done):
+        '''Runs in the sampling thread.
+        '''
+        while not done.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            names = []
+            # Only the frames below _call, the ones above are the same in
+            # every sample.
+            while frame is not None and frame.f_code is not _call.__code__:
+                names.append(frame_name(frame))
+                frame = frame.f_back
+            if frame is None or not names:
+                continue
+            names.reverse()
+            self.stacks[';'.join(names)] += 1
+            self.samples += 1
+
+
+def _call(function, args, kwargs):
+    return function(*args, **kwargs)
+
+def frame_name(frame):
+    '''e.g. board.py:walling_enemies
+    '''
+    code = frame.f_code
+    return '{}:{}'.format(os.path.basename(code.co_filename), code.co_name)
+
+def should_profile(header=None):
+    '''
+    Decides whether to profile a request, given the value of its
+    X-Samaritan-Profile header.
+    '''
+    if header is not None:
+        return header.strip().lower() in ('1', 'true', 'yes')
+    return RATE > 0 and random.random() < RATE
+
+def save(sampler, game_id, turn, width, height, objective=None,
+         directory=None):
+    '''
+    Has a profile written to directory by the logger's background thread
+    (see logger.defer), so the request doesn't wait on the disk. Returns the
+    path it will be written to.
+    '''
+    directory = directory or DIRECTORY
+    name = '{}-{}-{}.json'.format(game_id, turn, int(time() * 1000))
+    path = os.path.join(directory, name.replace(os.sep, '_'))
+    profile = {
+        'game_id': game_id,
+        'turn': turn,
+        'board': '{}x{}'.format(width, height),
+        'objective': objective,
+        'elapsed_ms': sampler.elapsed_ms,
+        'interval_ms': sampler.interval * 1000,
+        'samples': sampler.samples,
+        'stacks': dict(sampler.stacks),
+    }
+    logger.defer(_write, directory, path, profile)
+    return path
+
+def _write(directory, path, profile):
+    '''Writes a profile out, in the logger's background thread.
+    '''
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as profile_file:
+        json.dump(profile, profile_file)
@@ -0,0 +1,239 @@
+'''
+Records games to disk so slow or losing moves can be replayed offline.
+
+Every game gets its own append-only file. The file starts with a small
+header and is followed by one record per request:
+
+    length of the body (4 bytes), kind (1 byte), time (8 bytes),
+    time taken to answer in ms (8 bytes), body
+
+The body is zlib compressed JSON of the request, our response and the
+objective that decided the move. Requests are kept exactly as the game server
+sent them, in either API format.
+
+Writing is done by a background thread, so recording a request is just
+putting it on a queue. Files of games that stop getting requests without an
+end request are closed after IDLE_TIMEOUT seconds, and opened again if the
+game comes back. Reading memory-maps the file and decompresses one
+record at a time, so even very large logs are never loaded into memory.
+'''
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from queue import Queue, Empty
+from threading import Lock, Thread
+from time import time
+
+MAGIC = b'SMRC'
+VERSION = 1
+HEADER = struct.Struct('<4sB')
+RECORD = struct.Struct('<IBdd')
+EXTENSION = '.smr'
+
+START = 0
+MOVE = 1
+END = 2
+KINDS = {'start': START, 'move': MOVE, 'end': END}
+KIND_NAMES = {value: name for name, value in KINDS.items()}
+# Seconds after which the file of a game nobody's recorded anything for is
+# closed.
+IDLE_TIMEOUT = 60
+
+
+class Recorder(object):
+    '''Writes the requests of every game to its own file in directory.
+    '''
+
+    def __init__(self, directory):
+        '''
+        Initializes the recorder. The thread that does the writing is started
+        by the first record in each process, as server workers are forked
+        after samaritan.py is imported and a forked process doesn't have the
+        thread of its parent.
+        '''
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.lock = Lock()
+        self.pid = None
+        self.queue = None
+        self.thread = None
+        self.files = {}
+
+    def record(self, game_id, kind, request, response=None, objective=None,
+               elapsed_ms=0.0):
+        '''
+        Queues a request of kind ('start', 'move' or 'end') to be written to
+        the game's file. The file is closed after the end request.
+        '''
+        if self.pid != os.getpid():
+            self._start_thread()
+        self.queue.put((game_id, KINDS[kind], time(), elapsed_ms,
+                        {'request': request, 'response': response,
+                         'objective': objective}))
+
+    def close(self):
+        '''Waits for everything queued to be written and closes all files.
+        '''
+        if self.pid != os.getpid():
+            # Nothing was recorded in this process.
+            return
+        self.queue.put(None)
+        self.thread.join()
+
+    def _start_thread(self):
+        '''
+        Starts the thread that does the writing in this process, with nothing
+        queued, unless another request got there first.
+        '''
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            # Files inherited from the parent are its to write to and close.
+            self.queue = Queue()
+            self.files = {}
+            self.last_written = {}
+            self.thread = Thread(target=self._write_forever, name='recorder')
+            self.thread.daemon = True
+            self.thread.start()
+            self.pid = os.getpid()
+
+    def _write_forever(self):
+        '''Runs in the background thread.
+        '''
+        while True:
+            try:
+                item = self.queue.get(timeout=IDLE_TIMEOUT)
+            except Empty:
+                item = ()
+            self._close_idle_files()
+            if item is None:
+                break
+            if not item:
+                continue
+            game_id, kind, timestamp, elapsed_ms, body = item
+            try:
+                self._write(game_id, kind, timestamp, elapsed_ms, body)
+            except (OSError, TypeError, ValueError):
+                continue
+        for game_file in self.files.values():
+            game_file.close()
+        self.files.clear()
+        self.last_written.clear()
+
+    def _close_idle_files(self):
+        '''
+        Closes the files of games that haven't had a request for IDLE_TIMEOUT
+        seconds, e.g. because the server never sent the end request.
+        '''
+        now = time()
+        for game_id, written in list(self.last_written.items()):
+            if now - written >= IDLE_TIMEOUT:
+                self.files.pop(game_id).close()
+                del self.last_written[game_id]
+
+    def _write(self, game_id, kind, timestamp, elapsed_ms, body):
+        '''Appends a single record to the game's file.
+        '''
+        game_file = self.files.get(game_id)
+        if game_file is None:
+            path = game_path(self.directory, game_id)
+            try:
+                game_file = open(path, 'xb', buffering=0)
+                game_file.write(HEADER.pack(MAGIC, VERSION))
+            except FileExistsError:
+                game_file = open(path, 'ab', buffering=0)
+            self.files[game_id] = game_file
+        self.last_written[game_id] = time()
+        data = zlib.compress(json.dumps(body, separators=(',', ':')).encode(),
+                             1)
+        # A single write, so records from several processes don't interleave.
+        game_file.write(RECORD.pack(len(data), kind, timestamp, elapsed_ms)
+                        + data)
+        if kind == END:
+            game_file.close()
+            del self.files[game_id]
+            del self.last_written[game_id]
+
+
+class GameLog(object):
+    '''
+    Reads a game file written by Recorder. Iterating over it yields a
+    dictionary per record with its kind, time, elapsed_ms, request, response
+    and objective.
+    '''
+
+    def __init__(self, path):
+        '''Memory-maps the game file at path.
+        '''
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = None
+        if size >= HEADER.size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or version != VERSION:
+                self.close()
+                raise ValueError('{} is not a version {} game log'.format(
+                                                                path, VERSION))
+
+    def __iter__(self):
+        if self.map is None:
+            return
+        offset = HEADER.size
+        end = len(self.map)
+        while offset + RECORD.size <= end:
+            length, kind, timestamp, elapsed_ms = RECORD.unpack_from(self.map,
+                                                                     offset)
+            offset += RECORD.size
+            if offset + length > end:
+                # The last record was cut off, e.g. the server was killed.
+                return
+            body = json.loads(zlib.decompress(self.map[offset:offset+length])
+                              .decode())
+            offset += length
+            body['kind'] = KIND_NAMES[kind]
+            body['time'] = timestamp
+            body['elapsed_ms'] = elapsed_ms
+            yield body
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def game_path(directory, game_id):
+    '''Returns the path of a game's file in directory.
+    '''
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', str(game_id))
+    return os.path.join(directory, name + EXTENSION)
+
+def recorded_games(directory):
+    '''Returns the paths of every game file in directory, oldest first.
+    '''
+    paths = [os.path.join(directory, name) for name in os.listdir(directory)
+             if name.endswith(EXTENSION)]
+    return sorted(paths, key=os.path.getmtime)
+
+def recorded_moves(directory):
+    '''
+    Yields every recorded move request in directory, one game after another,
+    without loading more than one record at a time.
+    '''
+    for path in recorded_games(directory):
+        with GameLog(path) as game:
+            for record in game:
+                if record['kind'] == 'move':
+                    yield record
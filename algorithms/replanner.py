@@ -0,0 +1,100 @@
+from .graph_algorithms import (a_star, get_path_cost, get_distance_field,
+    on_board)
+
+class Replanner(object):
+    '''
+    Keeps the path Samaritan planned for each objective (his tail, the center,
+    a particular food) so that on the next turn the plan can be reused or
+    repaired instead of running A* from scratch.
+
+    One Replanner lives for the length of a game. Plans are only carried over
+    from one turn to the very next one, and only if Samaritan actually took
+    the first step of the plan.
+    '''
+
+    def __init__(self):
+        '''Initializes the replanner with no plans.
+        '''
+        self.plans = {}
+
+    def plan(self, board, objective, target, snake, cost_limit=99999):
+        '''
+        Returns (cost, path) from snake's head to target just like a_star.
+
+        Last turn's plan for the objective is checked against the new board
+        first. If it's still valid, it's reused as is. If obstacles moved onto
+        it or the target drifted (like our tail does every turn), the part of
+        the plan that is still valid is kept and the search carries on from
+        the end of it. Either way the plan is only used if it costs no more
+        than the target's distance field says any path from the head could
+        (see get_distance_field), as then A* couldn't have found a cheaper
+        one. Otherwise, or if there is no plan for the objective, a fresh A*
+        is done.
+        '''
+        previous = self.plans.pop(objective, None)
+        cost, path = (None, None)
+        if previous is not None:
+            cost, path = self._repair(board, previous, target, snake,
+                                      cost_limit)
+        if path is None and snake is board.samaritan:
+            # The board keeps Samaritan's searches for when paranoia sends
+            # him back.
+            cost, path = board.find_path(target, cost_limit)
+        elif path is None:
+            cost, path = a_star(board, snake.get_head(), target, snake,
+                                cost_limit)
+        if path is not None:
+            self.plans[objective] = (board.turn, target, cost, path)
+        return (cost, path)
+
+    def _repair(self, board, previous, target, snake, cost_limit):
+        '''
+        Tries to turn last turn's plan into a plan for this turn. Returns
+        (None, None) if the plan can't be used.
+        '''
+        prev_turn, prev_target, prev_cost, prev_path = previous
+        if board.turn is None or prev_turn is None or board.turn != prev_turn+1:
+            return (None, None)
+        if len(prev_path) < 2 or prev_path[1] != snake.get_head():
+            return (None, None)
+        head = snake.get_head()
+        if not (on_board(board, target) and on_board(board, head)):
+            return (None, None)
+        # The least any path from the head to target can cost.
+        field = get_distance_field(board, target)
+        lower_bound = field[head[1] * board.width + head[0]]
+        if lower_bound > cost_limit:
+            return (None, None)
+        path = prev_path[1:]
+        if target in path:
+            path = path[:path.index(target)+1]
+        if path[-1] == target:
+            cost, foods_in_path = get_path_cost(board, path, snake)
+            if cost is not None:
+                if cost <= lower_bound:
+                    return (cost, path)
+                return (None, None)
+        # Keep the part of the plan that's still valid and search from there.
+        valid_length = 1
+        foods_in_path = 1 if path[0] in board.foods else 0
+        for distance, node in enumerate(path[1:], 1):
+            if not board.is_valid_coordinate(node[0], node[1], snake, distance,
+                                             foods_in_path):
+                break
+            valid_length += 1
+            if node in board.foods:
+                foods_in_path += 1
+        prefix = path[:valid_length]
+        if len(prefix) == 1 or prefix[-1] == target:
+            return (None, None)
+        # Searching on from the prefix is only worth it if it isn't already
+        # more expensive than the lower bound.
+        prefix_cost = get_path_cost(board, prefix, snake)[0]
+        end = prefix[-1]
+        if (prefix_cost is None or prefix_cost + field[end[1] * board.width
+                                                       + end[0]] > lower_bound):
+            return (None, None)
+        cost, path = a_star(board, head, target, snake, cost_limit, prefix)
+        if cost is None or cost > lower_bound:
+            return (None, None)
+        return (cost, path)
@@ -0,0 +1,229 @@
+'''
+Immutable positions that are cheap to derive, hash and send to other
+processes.
+
+A Snapshot holds a position as tuples: the foods, and for every snake its
+id, name, health and Body. Advancing a snapshot by a turn makes a new one
+that shares everything it can with its parent: each snake's new Body is just
+his new head and a reference to the body he moved from, and the foods are
+the same tuple when nobody ate. A successor costs a few small objects per
+snake whatever their length, and the nodes of a body are only put together
+if something reads them. Pickling packs every node into one array of
+shorts, so a snapshot is a few hundred bytes to send to a worker process
+however many snakes are on the board.
+'''
+from array import array
+from collections import namedtuple
+
+SnakeState = namedtuple('SnakeState', ['id', 'name', 'health', 'body'])
+
+
+class Body(object):
+    '''
+    The nodes of a snake, head first, read like a tuple of nodes. A body made
+    by moved is kept as its head, the body it moved from (its parent) and how
+    many of the parent's nodes follow the head, with the last node repeated
+    up to its length when the snake grew. Its nodes are only put together the
+    first time they're read, after which the parent is let go.
+    '''
+    __slots__ = ('head', 'length', 'parent', 'keep', '_nodes')
+
+    def __init__(self, nodes):
+        self._nodes = tuple(nodes)
+        self.head = self._nodes[0] if self._nodes else None
+        self.length = len(self._nodes)
+        self.parent = None
+        self.keep = 0
+
+    def moved(self, node, grew=False):
+        '''
+        The body after the snake moved his head to node: his tail moves up,
+        and if he grew his new last node is doubled. Nothing is copied.
+        '''
+        body = Body.__new__(Body)
+        body.head = node
+        body.length = self.length + 1 if grew else self.length
+        body.parent = self
+        body.keep = max(0, self.length - 1)
+        body._nodes = None
+        return body
+
+    def nodes(self):
+        '''The nodes as a tuple, head first.
+        '''
+        if self._nodes is None:
+            # Up to the nearest body whose nodes are known, then back down,
+            # so a long line of bodies doesn't recurse.
+            chain = []
+            body = self
+            while body._nodes is None:
+                chain.append(body)
+                body = body.parent
+            for body in reversed(chain):
+                nodes = (body.head,) + body.parent._nodes[:body.keep]
+                body._nodes = nodes + nodes[-1:] * (body.length - len(nodes))
+                body.parent = None
+        return self._nodes
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.nodes())
+
+    def __getitem__(self, index):
+        if index == 0 and self.length:
+            return self.head
+        return self.nodes()[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Body):
+            other = other.nodes()
+        return self.nodes() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.nodes())
+
+    def __repr__(self):
+        return 'Body({!r})'.format(self.nodes())
+
+
+class Snapshot(object):
+    '''
+    A position, as seen by the snake with id you. snakes includes you, in the
+    order the game server sent them.
+    '''
+    __slots__ = ('width', 'height', 'foods', 'snakes', 'you', 'turn', 'game',
+                 '_key')
+
+    def __init__(self, width, height, foods, snakes, you, turn=None,
+                 game=None):
+        self.width = width
+        self.height = height
+        self.foods = tuple(foods)
+        self.snakes = tuple(snakes)
+        self.you = you
+        self.turn = turn
+        self.game = game
+        self._key = None
+
+    @classmethod
+    def from_data(cls, data):
+        '''Makes a snapshot of a 2019 API move request.
+        '''
+        board = data['board']
+        snakes = [SnakeState(snake['id'], snake['name'], snake['health'],
+                             Body((point['x'], point['y'])
+                                  for point in snake['body']))
+                  for snake in board['snakes']]
+        return cls(board['width'], board['height'],
+                   ((point['x'], point['y']) for point in board['food']),
+                   snakes, data['you']['id'], data.get('turn'),
+                   data.get('game'))
+
+    def to_data(self):
+        '''Returns the 2019 API move request for the snapshot, for Board.
+        '''
+        snakes = [{'id': snake.id, 'name': snake.name, 'health': snake.health,
+                   'body': [{'x': x, 'y': y} for x, y in snake.body]}
+                  for snake in self.snakes]
+        return {
+            'game': self.game,
+            'turn': self.turn,
+            'board': {
+                'width': self.width,
+                'height': self.height,
+                'food': [{'x': x, 'y': y} for x, y in self.foods],
+                'snakes': snakes,
+            },
+            'you': [snake for snake in snakes if snake['id'] == self.you][0],
+        }
+
+    def snake(self, snake_id):
+        '''Returns the SnakeState of the snake with snake_id, None if it's dead.
+        '''
+        for snake in self.snakes:
+            if snake.id == snake_id:
+                return snake
+        return None
+
+    def advance(self, moves):
+        '''
+        Returns the snapshot a turn later, given the node every snake moves
+        its head to (moves maps snake id to node). Every tail moves up. A
+        snake that moves onto food eats it, gets back to full health and
+        grows like the game server (and engine.referee) has him grow: his
+        new last node is doubled. The others lose a point of health. No body
+        is copied (see Body.moved). Snakes without a move are left out, like
+        they died. Collisions aren't checked.
+        '''
+        foods = self.foods
+        eaten = set(node for node in moves.values() if node in foods)
+        if eaten:
+            foods = tuple(food for food in foods if food not in eaten)
+        snakes = []
+        for snake in self.snakes:
+            node = moves.get(snake.id)
+            if node is None:
+                continue
+            body = snake.body.moved(node, node in eaten)
+            health = 100 if node in eaten else snake.health - 1
+            snakes.append(SnakeState(snake.id, snake.name, health, body))
+        return Snapshot(self.width, self.height, foods, snakes, self.you,
+                        self.turn + 1 if self.turn is not None else None,
+                        self.game)
+
+    def key(self):
+        '''
+        A hashable key for the position: two snapshots with the same key get
+        the same move from Board.get_action. It's worked out once.
+        '''
+        if self._key is None:
+            self._key = (self.width, self.height, self.you,
+                         tuple(sorted(self.foods)),
+                         tuple(sorted((snake.id, snake.health,
+                                       snake.body.nodes())
+                                      for snake in self.snakes)))
+        return self._key
+
+    def __eq__(self, other):
+        return isinstance(other, Snapshot) and self.key() == other.key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __getstate__(self):
+        '''
+        Packs every node into one array: the foods, then for each snake the
+        length of its body followed by its nodes.
+        '''
+        nodes = array('h', [len(self.foods)])
+        for food in self.foods:
+            nodes.extend(food)
+        for snake in self.snakes:
+            nodes.append(len(snake.body))
+            for node in snake.body:
+                nodes.extend(node)
+        return (self.width, self.height, self.you, self.turn, self.game,
+                [(snake.id, snake.name, snake.health) for snake in self.snakes],
+                nodes.tobytes())
+
+    def __setstate__(self, state):
+        (self.width, self.height, self.you, self.turn, self.game, snakes,
+         packed) = state
+        nodes = array('h')
+        nodes.frombytes(packed)
+        values = iter(nodes)
+        self.foods = tuple((next(values), next(values))
+                           for _ in range(next(values)))
+        self.snakes = tuple(SnakeState(snake_id, name, health,
+                                       Body((next(values), next(values))
+                                            for _ in range(next(values))))
+                            for snake_id, name, health in snakes)
+        self._key = None
@@ -0,0 +1,88 @@
+'''
+The positions trapping_enemies looks for, as a table.
+
+An enemy running along an edge can be trapped against it. Whether Samaritan
+can trap him only depends on which edge he's on, where Samaritan's head is
+from his and which way he's going, so every trap is written down once for the
+right edge and turned and mirrored onto the other three edges when the module
+is loaded. Finding the trap for a position is then a dictionary lookup, and
+all that's left is checking the move is valid.
+'''
+
+# What else a trap needs, besides the move being valid.
+ALWAYS = 'always'
+# The enemy is shorter than Samaritan, so Samaritan wins a head on collision.
+SHORTER = 'shorter'
+# The enemy has at most one free node next to his head.
+CORNERED = 'cornered'
+
+DIRECTIONS = {'up': (0, -1), 'down': (0, 1), 'left': (-1, 0), 'right': (1, 0)}
+
+# The traps for an enemy on the right edge, in the order they're tried:
+# (Samaritan's head from the enemy's head, direction the enemy is going, what
+# else is needed, Samaritan's move). An enemy direction of None matches every
+# direction, and a move of None is the enemy's direction.
+_RIGHT_EDGE_TRAPS = [
+    ((-1, 0), None, ALWAYS, None),
+    ((-2, 0), None, SHORTER, 'right'),
+    ((-1, -1), 'down', SHORTER, 'down'),
+    ((-1, 1), 'up', SHORTER, 'up'),
+    ((-1, 1), 'down', CORNERED, 'down'),
+    ((-1, -1), 'up', CORNERED, 'up'),
+]
+
+# edge: how a vector on the right edge turns into one on this edge
+_SYMMETRIES = {
+    'right': lambda x, y: (x, y),
+    'left': lambda x, y: (-x, y),
+    'down': lambda x, y: (y, x),
+    'up': lambda x, y: (y, -x),
+}
+
+
+def edge(node, width, height):
+    '''
+    The edge of the board node is on, named by the direction that runs into
+    it, or None if it isn't on one. Corners are on the left or right edge.
+    '''
+    xcoord, ycoord = node
+    if xcoord == width - 1:
+        return 'right'
+    elif xcoord == 0:
+        return 'left'
+    elif ycoord == height - 1:
+        return 'down'
+    elif ycoord == 0:
+        return 'up'
+    return None
+
+def _compile():
+    '''
+    Makes the table of traps on every edge: (edge, Samaritan's head from the
+    enemy's head, direction the enemy is going): (what else is needed, move).
+    Where more than one trap matches a key, the first one tried is kept.
+    '''
+    names = {vector: name for name, vector in DIRECTIONS.items()}
+    patterns = {}
+    for edge_name, symmetry in _SYMMETRIES.items():
+        def turn(direction):
+            return names[symmetry(*DIRECTIONS[direction])]
+        for offset, direction, requirement, move in _RIGHT_EDGE_TRAPS:
+            offset = symmetry(*offset)
+            if direction is None:
+                directions = list(DIRECTIONS) + [None]
+            else:
+                directions = [turn(direction)]
+            for enemy_direction in directions:
+                if move is not None:
+                    trap_move = turn(move)
+                elif enemy_direction is not None:
+                    trap_move = enemy_direction
+                else:
+                    # The enemy hasn't moved yet, so there's no way to follow.
+                    continue
+                patterns.setdefault((edge_name, offset, enemy_direction),
+                                    (requirement, trap_move))
+    return patterns
+
+PATTERNS = _compile()
@@ -27,6 +27,10 @@ def convert_2018_api_to_2019(api_2018):
     all_snakes = api_2018['snakes']['data']
     you = api_2018['you']
     api_2019 = {
+        "game": {
+            "id": api_2018.get('id')
+        },
+        "turn": api_2018.get('turn'),
         "board": {
             "food": foods,
             "width": width,
@@ -49,40 +53,45 @@ def convert_2018_api_to_2019(api_2018):
         })
     return api_2019
 
-# def convert_2019_api_to_2018(api_2019):
-#     width = api_2019['board']['width']
-#     height = api_2019['board']['height']
-#     foods = api_2019['board']['food'] # list of json with foods
-#     you = api_2019['you']
-#     all_snakes = api_2019['board']['snakes']
-#     api_2018 = {
-#         "food": {
-#             "data": foods
-#         },
-#         "height": height,
-#         "width": width,
-#         "snakes": {
-#             "data": []
-#         }
-#     }
-#     for x in range(0, all_snakes):
-#         api_2018['snakes']['data'].append({
-#             "body": {
-#                 "data": []
-#             },
-#             "health": all_snakes[x].health,
-#             "id": all_snakes[x].id,
-#             "name": all_snakes[x].name,
-#         })
-#         api_2018['snakes']['data'][x]['body']['data'].append(all_snakes['body'])
-#
-#     api_2018['you']['data'] = {
-#         "body": {
-#             "data": []
-#         },
-#         "health": you.health,
-#         "id": you.id,
-#         "name": you.name,
-#     }
-#     api_2018['you']['data']['body']['data'] = you['body']
-#     return api_2018
+def get_game_id(data):
+    '''
+    Returns the id of the game a request is for, whether the request is in the
+    2018 or the 2019 format.
+    '''
+    if 'game' in data:
+        return data['game']['id']
+    return data.get('game_id', data.get('id'))
+
+def convert_2019_api_to_2018(api_2019):
+    '''
+    The opposite of convert_2018_api_to_2019, e.g. to send requests made in
+    the 2019 format to Samaritan while he's set up for the 2018 game server.
+    '''
+    def snake_2018(snake):
+        return {
+            "object": "snake",
+            "id": snake['id'],
+            "name": snake['name'],
+            "health": snake['health'],
+            "length": len(snake['body']),
+            "body": {
+                "object": "list",
+                "data": snake['body']
+            }
+        }
+    return {
+        "object": "world",
+        "id": (api_2019.get('game') or {}).get('id'),
+        "turn": api_2019.get('turn'),
+        "width": api_2019['board']['width'],
+        "height": api_2019['board']['height'],
+        "food": {
+            "object": "list",
+            "data": api_2019['board']['food']
+        },
+        "snakes": {
+            "object": "list",
+            "data": [snake_2018(snake) for snake in api_2019['board']['snakes']]
+        },
+        "you": snake_2018(api_2019['you'])
+    }
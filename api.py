@@ -34,6 +34,15 @@ def move_response(move):
         })
     )
 
+def metrics_response(text):
+    return HTTPResponse(
+        status=200,
+        headers={
+            "Content-Type": "text/plain; version=0.0.4"
+        },
+        body=text
+    )
+
 def end_response():
     return HTTPResponse(
         status=200
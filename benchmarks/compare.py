@@ -0,0 +1,39 @@
+'''
+Compares two benchmarks.run result files, e.g. master against a branch.
+
+    $ python -m benchmarks.compare master.json branch.json
+'''
+import argparse
+import json
+
+COLUMNS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+    with open(args.before) as before_file:
+        before = json.load(before_file)['results']
+    with open(args.after) as after_file:
+        after = json.load(after_file)['results']
+    print('{:<26}'.format('benchmark') + ''.join(
+        '{:>24}'.format(column) for column in COLUMNS))
+    for name in sorted(set(before) & set(after)):
+        row = '{:<26}'.format(name)
+        for column in COLUMNS:
+            row += '{:>24}'.format(change(before[name][column],
+                                          after[name][column]))
+        print(row)
+
+def change(before, after):
+    '''e.g. 1.20 -> 0.90 (-25.0%)
+    '''
+    if not before:
+        return '{:.2f} -> {:.2f}'.format(before or 0, after or 0)
+    return '{:.2f} -> {:.2f} ({:+.1f}%)'.format(before, after,
+                                                (after - before) / before * 100)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+import json
+import os
+from algorithms.utils import convert_2018_api_to_2019
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'data',
+                              'corpus-v1.jsonl')
+
+
+def load_corpus(path=DEFAULT_CORPUS, name_filter=None):
+    '''
+    Returns the positions in a corpus file, one JSON object per line, with
+    every payload converted to the 2019 format that Board expects. If
+    name_filter is given, only positions with it in their name are returned.
+    '''
+    positions = []
+    with open(path) as corpus:
+        for line in corpus:
+            if not line.strip():
+                continue
+            position = json.loads(line)
+            if name_filter and name_filter not in position['name']:
+                continue
+            if position['format'] == 2018:
+                position['payload'] = convert_2018_api_to_2019(
+                                                        position['payload'])
+            positions.append(position)
+    return positions
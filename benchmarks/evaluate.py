@@ -0,0 +1,165 @@
+'''
+Asks Samaritan for his move on every board in a stream, using a pool of
+processes, without going through the HTTP server.
+
+    $ python -m benchmarks.evaluate boards.jsonl --workers 8 > moves.jsonl
+    $ cat boards.jsonl | python -m benchmarks.evaluate - --counters
+    $ python -m benchmarks.evaluate --recorded games/ > moves.jsonl
+
+Every input line is a move request in either API format, a corpus position
+(its payload is used) or a record with the request under "request". With
+--recorded every move recorded with RECORD_GAMES in a directory is read
+instead.
+
+For every input there's an output line, in the same order, with the move,
+the objective, the time taken in ms and, with --counters, the work done by
+the searches (see algorithms/counters.py). Inputs that can't be evaluated
+get an output line with the error. At most --window boards are in flight at
+once, so memory doesn't grow with the size of the input.
+'''
+import argparse
+import json
+import sys
+from collections import Counter, deque
+from multiprocessing import Pool
+from time import perf_counter
+from algorithms import counters
+from algorithms.board import Board
+from algorithms.recorder import recorded_moves
+from algorithms.utils import convert_2018_api_to_2019, get_game_id
+
+
+def read_lines(stream):
+    '''Yields (line number, line) for every line of stream that isn't blank.
+    '''
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            yield number, line
+
+def read_recorded(directory):
+    '''Yields (record number, request as JSON) for every recorded move.
+    '''
+    for number, record in enumerate(recorded_moves(directory), 1):
+        yield number, json.dumps(record['request'])
+
+def get_request(item):
+    '''
+    Returns the move request in an input line's JSON, in the 2019 format, and
+    the name of the position if it has one.
+    '''
+    name = item.get('name')
+    if 'payload' in item:
+        item = item['payload']
+    elif 'request' in item:
+        item = item['request']
+    if 'board' not in item:
+        item = convert_2018_api_to_2019(item)
+    return item, name
+
+def evaluate(task):
+    '''
+    Gets the move for a single input line. task is (line number, line). Runs
+    in a worker process.
+    '''
+    number, line = task
+    result = {'line': number}
+    try:
+        request, name = get_request(json.loads(line))
+        if name is not None:
+            result['name'] = name
+        result['game_id'] = get_game_id(request)
+        result['turn'] = request.get('turn')
+        counters.reset()
+        start = perf_counter()
+        objective, move = Board(request).get_action()
+        result['ms'] = (perf_counter() - start) * 1000
+    except Exception as exception:
+        result['error'] = '{}: {}'.format(type(exception).__name__, exception)
+        return result
+    result['move'] = move
+    result['objective'] = objective
+    if counters.ENABLED:
+        result['work'] = counters.snapshot()
+    return result
+
+def _enable_counters():
+    counters.ENABLED = True
+
+def evaluate_all(tasks, workers=1, window=256, count_work=False):
+    '''
+    Yields the result of every task in order, evaluating them with workers
+    processes and keeping at most window of them in flight.
+    '''
+    if count_work:
+        _enable_counters()
+    if workers <= 1:
+        for task in tasks:
+            yield evaluate(task)
+        return
+    pool = Pool(workers, initializer=_enable_counters if count_work else None)
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(pool.apply_async(evaluate, (task,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('input', nargs='?', default='-',
+                        help='JSONL file of boards, - for stdin')
+    parser.add_argument('--recorded', help='evaluate every move recorded in '
+                                           'this directory instead')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--window', type=int, default=256,
+                        help='most boards in flight at once')
+    parser.add_argument('--counters', action='store_true',
+                        help='also report the work done by the searches')
+    parser.add_argument('--output', help='write the results here instead of '
+                                         'stdout')
+    args = parser.parse_args()
+    input_file = None
+    if args.recorded:
+        tasks = read_recorded(args.recorded)
+    elif args.input == '-':
+        tasks = read_lines(sys.stdin)
+    else:
+        input_file = open(args.input)
+        tasks = read_lines(input_file)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    # Running totals only, so the summary doesn't grow with the input either.
+    evaluated = errors = 0
+    total_ms = max_ms = 0.0
+    objectives = Counter()
+    moves = Counter()
+    for result in evaluate_all(tasks, args.workers, args.window,
+                               args.counters):
+        output.write(json.dumps(result, sort_keys=True) + '\n')
+        if 'error' in result:
+            errors += 1
+            continue
+        evaluated += 1
+        total_ms += result['ms']
+        max_ms = max(max_ms, result['ms'])
+        objectives[result['objective']] += 1
+        moves[result['move']] += 1
+    if input_file is not None:
+        input_file.close()
+    if args.output:
+        output.close()
+    sys.stderr.write(json.dumps({
+        'evaluated': evaluated,
+        'errors': errors,
+        'mean_ms': total_ms / evaluated if evaluated else None,
+        'max_ms': max_ms if evaluated else None,
+        'objectives': objectives,
+        'moves': moves,
+    }, indent=2, sort_keys=True) + '\n')
+
+if __name__ == '__main__':
+    main()
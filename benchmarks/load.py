@@ -0,0 +1,215 @@
+'''
+Load tests a running Samaritan server with many games at once.
+
+    $ python -m benchmarks.load --url http://localhost:8099 --games 40 \
+          --concurrency 1 4 8 --deadline-ms 200 --turn-ms 500
+
+Every game is a stream of /start, /move and /end requests, either replayed
+from games recorded with RECORD_GAMES (--recorded) or made up by playing
+local games between the baseline bots. Up to --concurrency games are played
+against the server at once, and within a game a move is only sent once the
+last one was answered and --turn-ms has passed since it was sent, like a
+game server waiting on the other snakes.
+
+With --server-workers the tool starts samaritan.py itself, once with each
+number of WORKERS, to show how throughput scales with the number of server
+processes.
+
+For every run the report has the latency percentiles per endpoint, the
+fraction of requests slower than --deadline-ms (or failed) and the
+requests per second.
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+from time import perf_counter, sleep, time
+import requests
+from algorithms.recorder import GameLog, recorded_games
+from algorithms.utils import convert_2019_api_to_2018
+from engine.bots import BOTS
+from engine.referee import Game
+from .run import summarize
+
+ENDPOINTS = {'start': '/start', 'move': '/move', 'end': '/end'}
+SAMARITAN = os.path.join(os.path.dirname(os.path.dirname(
+                                        os.path.abspath(__file__))),
+                         'samaritan.py')
+
+
+class RecordingBot(object):
+    '''Plays like bot, and keeps every request it was sent.
+    '''
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.requests = []
+
+    def get_move(self, request):
+        self.requests.append(request)
+        return self.bot.get_move(request)
+
+
+def synthetic_streams(games, seed=0, width=11, height=11, api=2018):
+    '''
+    Yields made-up games as lists of (kind, request). Each game is a local game
+    between a hungry bot and a random bot, seen by the hungry bot.
+    '''
+    for number in range(games):
+        game_seed = seed + number
+        player = RecordingBot(BOTS['hungry'](game_seed))
+        bots = [('snake-0', player), ('snake-1', BOTS['random'](game_seed))]
+        game = Game(bots, width, height, game_seed,
+                    game_id='load-{}'.format(game_seed))
+        game.play()
+        start = {'game_id': game.id, 'width': width, 'height': height}
+        moves = [convert_2019_api_to_2018(request) if api == 2018 else request
+                 for request in player.requests]
+        yield ([('start', start)] + [('move', move) for move in moves]
+               + [('end', start)])
+
+def recorded_streams(directory, games):
+    '''Yields up to games recorded games as lists of (kind, request).
+    '''
+    for path in recorded_games(directory)[:games]:
+        with GameLog(path) as game:
+            yield [(record['kind'], record['request']) for record in game]
+
+def play_stream(url, stream, turn_seconds, timeout, results, lock):
+    '''Sends one game's requests in order, pacing the moves.
+    '''
+    session = requests.Session()
+    for kind, request in stream:
+        sent = perf_counter()
+        error = None
+        try:
+            response = session.post(url + ENDPOINTS[kind], json=request,
+                                    timeout=timeout)
+            if response.status_code != 200:
+                error = 'HTTP {}'.format(response.status_code)
+        except requests.RequestException as exception:
+            error = type(exception).__name__
+        elapsed = perf_counter() - sent
+        with lock:
+            results.append((kind, elapsed * 1000, error))
+        if kind == 'move':
+            sleep(max(0.0, turn_seconds - elapsed))
+
+def run_load(url, streams, concurrency, turn_ms, deadline_ms):
+    '''
+    Plays streams against url, at most concurrency at once. Returns the
+    report for the run.
+    '''
+    results = []
+    lock = threading.Lock()
+    pending = list(streams)
+    pending.reverse()
+    timeout = max(1.0, deadline_ms * 10 / 1000.0)
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                stream = pending.pop()
+            play_stream(url, stream, turn_ms / 1000.0, timeout, results, lock)
+
+    started = time()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time() - started
+    report = {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'seconds': duration,
+        'requests_per_second': len(results) / duration if duration else None,
+        'timeout_rate': (float(sum(1 for kind, ms, error in results
+                                   if error or ms > deadline_ms))
+                         / len(results)) if results else None,
+        'errors': sum(1 for kind, ms, error in results if error),
+        'endpoints': {},
+    }
+    for kind in ENDPOINTS:
+        timings = [ms for result_kind, ms, error in results
+                   if result_kind == kind and not error]
+        if timings:
+            report['endpoints'][kind] = summarize(timings)
+    return report
+
+def start_server(port, workers):
+    '''
+    Starts samaritan.py with WORKERS=workers on port and waits until it
+    answers.
+    '''
+    environment = dict(os.environ, PORT=str(port), WORKERS=str(workers))
+    server = subprocess.Popen([sys.executable, SAMARITAN], env=environment,
+                              stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    url = 'http://127.0.0.1:{}'.format(port)
+    for _ in range(100):
+        try:
+            requests.post(url + '/ping', timeout=1)
+            return server, url
+        except requests.RequestException:
+            sleep(0.1)
+    server.terminate()
+    raise RuntimeError('samaritan.py did not start on port {}'.format(port))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--url', default='http://localhost:8099')
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4])
+    parser.add_argument('--turn-ms', type=float, default=500,
+                        help='time between moves of a game')
+    parser.add_argument('--deadline-ms', type=float, default=200,
+                        help='requests slower than this count as timeouts')
+    parser.add_argument('--recorded', help='replay the games recorded in '
+                                           'this directory')
+    parser.add_argument('--api', type=int, choices=(2018, 2019), default=2018,
+                        help='format of made-up move requests')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--server-workers', type=int, nargs='+',
+                        help='start samaritan.py with each of these numbers '
+                             'of WORKERS instead of using --url')
+    parser.add_argument('--port', type=int, default=8199,
+                        help='port for the servers started by the tool')
+    args = parser.parse_args()
+    if args.recorded:
+        streams = list(recorded_streams(args.recorded, args.games))
+    else:
+        streams = list(synthetic_streams(args.games, args.seed, api=args.api))
+    reports = []
+    for workers in args.server_workers or [None]:
+        server = None
+        url = args.url
+        if workers is not None:
+            server, url = start_server(args.port, workers)
+        try:
+            for concurrency in args.concurrency:
+                report = run_load(url, streams, concurrency, args.turn_ms,
+                                  args.deadline_ms)
+                report['server_workers'] = workers
+                reports.append(report)
+                sys.stderr.write('workers={} concurrency={}: {:.1f} req/s, '
+                                 '{:.1%} timeouts\n'.format(
+                                    workers, concurrency,
+                                    report['requests_per_second'] or 0,
+                                    report['timeout_rate'] or 0))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+    sys.stdout.write(json.dumps({'deadline_ms': args.deadline_ms,
+                                 'turn_ms': args.turn_ms,
+                                 'games': len(streams),
+                                 'runs': reports}, indent=2, sort_keys=True)
+                     + '\n')
+
+if __name__ == '__main__':
+    main()
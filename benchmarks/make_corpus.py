@@ -0,0 +1,179 @@
+'''
+Generates the benchmark corpus of /move payloads.
+
+Positions are laid out with seeded random walks, so running this again with
+the same seed and version gives the same corpus. Every board size gets an
+early, mid and late game position, both with Samaritan in open space and,
+where one can be found, with Samaritan trapped in a pocket smaller than his
+body. Payloads alternate between the 2018 and 2019 API formats.
+
+    $ python -m benchmarks.make_corpus > benchmarks/data/corpus-v1.jsonl
+'''
+import argparse
+import json
+import random
+import sys
+
+BOARD_SIZES = [(7, 7), (11, 11), (19, 19)]
+# phase: (snake lengths, healths, foods per 100 cells)
+PHASES = {
+    'early': ((3, 4), (85, 100), 4),
+    'mid': ((5, 12), (30, 100), 3),
+    'late': ((12, 30), (5, 100), 2),
+}
+MAX_TRIES = 2000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--seed', type=int, default=2018)
+    parser.add_argument('--version', default='v1')
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+    count = 0
+    for width, height in BOARD_SIZES:
+        for phase in ('early', 'mid', 'late'):
+            for situation in ('open', 'trapped'):
+                position = find_position(rnd, width, height, phase, situation)
+                if position is None:
+                    continue
+                api_format = 2018 if count % 2 == 0 else 2019
+                count += 1
+                entry = {
+                    'name': '{}x{}-{}-{}-{}snakes'.format(
+                        width, height, phase, situation,
+                        len(position['snakes'])),
+                    'version': args.version,
+                    'format': api_format,
+                    'board': '{}x{}'.format(width, height),
+                    'phase': phase,
+                    'situation': situation,
+                    'snakes': len(position['snakes']),
+                    'payload': (to_2018_payload(position) if api_format == 2018
+                                else to_2019_payload(position)),
+                }
+                sys.stdout.write(json.dumps(entry, sort_keys=True) + '\n')
+
+def find_position(rnd, width, height, phase, situation):
+    '''
+    Lays out random positions until one matches situation. Returns None if
+    none did.
+    '''
+    for attempt in range(MAX_TRIES):
+        most_snakes = 4 if width * height <= 49 else 8
+        position = random_position(rnd, width, height, phase,
+                                   rnd.randint(2, most_snakes))
+        if position is None:
+            continue
+        trapped = is_trapped(position)
+        if trapped == (situation == 'trapped'):
+            return position
+    return None
+
+def random_position(rnd, width, height, phase, number_of_snakes):
+    '''
+    Returns a dictionary with the width, height, turn, foods and snakes of a
+    random position. The first snake is Samaritan.
+    '''
+    lengths, healths, food_density = PHASES[phase]
+    occupied = set()
+    snakes = []
+    for index in range(number_of_snakes):
+        length = rnd.randint(*lengths)
+        body = random_body(rnd, width, height, length, occupied)
+        if body is None:
+            return None
+        occupied.update(body)
+        if phase == 'early' and rnd.random() < 0.5:
+            body.append(body[-1])
+        snakes.append({
+            'id': 'snake-{}'.format(index),
+            'name': 'Samaritan' if index == 0 else 'Enemy {}'.format(index),
+            'health': rnd.randint(*healths),
+            'body': body,
+        })
+    foods = []
+    for _ in range(max(1, width * height * food_density // 100)):
+        node = (rnd.randrange(width), rnd.randrange(height))
+        if node not in occupied and node not in foods:
+            foods.append(node)
+    turn = {'early': 3, 'mid': 60, 'late': 200}[phase] + rnd.randrange(20)
+    return {'width': width, 'height': height, 'turn': turn, 'foods': foods,
+            'snakes': snakes}
+
+def random_body(rnd, width, height, length, occupied):
+    '''A self-avoiding random walk of length nodes that avoids occupied.
+    '''
+    free = [(x, y) for x in range(width) for y in range(height)
+            if (x, y) not in occupied]
+    if not free:
+        return None
+    body = [rnd.choice(free)]
+    while len(body) < length:
+        x, y = body[-1]
+        options = [node for node in ((x+1, y), (x-1, y), (x, y+1), (x, y-1))
+                   if 0 <= node[0] < width and 0 <= node[1] < height
+                   and node not in occupied and node not in body]
+        if not options:
+            return None
+        body.append(rnd.choice(options))
+    return body
+
+def is_trapped(position):
+    '''
+    Tells us whether Samaritan's head is in a pocket of free cells smaller
+    than his body, counting every body as a wall.
+    '''
+    walls = set()
+    for snake in position['snakes']:
+        walls.update(snake['body'])
+    samaritan = position['snakes'][0]['body']
+    to_visit = [samaritan[0]]
+    seen = set(to_visit)
+    while to_visit and len(seen) <= len(samaritan):
+        x, y = to_visit.pop()
+        for node in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+            if (0 <= node[0] < position['width']
+                and 0 <= node[1] < position['height']
+                and node not in walls and node not in seen):
+                seen.add(node)
+                to_visit.append(node)
+    return len(seen) - 1 < len(samaritan)
+
+def _points(nodes):
+    return [{'x': x, 'y': y} for x, y in nodes]
+
+def to_2019_payload(position):
+    snakes = [{'id': snake['id'], 'name': snake['name'],
+               'health': snake['health'], 'body': _points(snake['body'])}
+              for snake in position['snakes']]
+    return {
+        'game': {'id': 'benchmark'},
+        'turn': position['turn'],
+        'board': {
+            'width': position['width'],
+            'height': position['height'],
+            'food': _points(position['foods']),
+            'snakes': snakes,
+        },
+        'you': snakes[0],
+    }
+
+def to_2018_payload(position):
+    snakes = [{'object': 'snake', 'id': snake['id'], 'name': snake['name'],
+               'health': snake['health'], 'length': len(snake['body']),
+               'body': {'object': 'list', 'data': _points(snake['body'])}}
+              for snake in position['snakes']]
+    return {
+        'object': 'world',
+        'id': 1,
+        'turn': position['turn'],
+        'width': position['width'],
+        'height': position['height'],
+        'food': {'object': 'list', 'data': _points(position['foods'])},
+        'snakes': {'object': 'list', 'data': snakes},
+        'you': snakes[0],
+    }
+
+if __name__ == '__main__':
+    main()
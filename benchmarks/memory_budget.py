@@ -0,0 +1,104 @@
+'''
+Checks that no strategy uses more memory than its budget on any position of
+the benchmark corpus.
+
+    $ python -m benchmarks.memory_budget
+    $ python -m benchmarks.memory_budget --write --headroom 1.5
+
+Every position is run once with memory tracking on (see
+algorithms/memory.py). For each board size, the peak memory of the whole
+move ("move") and of every strategy is compared with the budgets in
+data/memory-budgets.json, and the command fails if any of them is over.
+--write replaces the budgets with what was measured, times --headroom, but
+at least --floor bytes so that strategies that barely allocate don't fail on
+noise.
+'''
+import argparse
+import json
+import math
+import os
+import sys
+from algorithms import memory
+from algorithms.board import Board
+from .corpus import DEFAULT_CORPUS, load_corpus
+from .run import clear_caches
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(__file__), 'data',
+                               'memory-budgets.json')
+MOVE = 'move'
+
+
+def measure(positions):
+    '''
+    Returns the highest peak memory of the move and of every strategy over
+    positions, by board size.
+    '''
+    memory.ENABLED = True
+    peaks = {}
+    for position in positions:
+        memory.reset()
+        clear_caches()
+        token = memory.begin()
+        Board(position['payload']).get_action()
+        memory.end(MOVE, token)
+        board_peaks = peaks.setdefault(position['board'], {})
+        for strategy, usage in memory.snapshot().items():
+            board_peaks[strategy] = max(board_peaks.get(strategy, 0),
+                                        usage['peak_bytes'])
+    return peaks
+
+def over_budget(peaks, budgets):
+    '''
+    Returns (board, strategy, peak, budget) for every peak over its budget.
+    Strategies without a budget aren't checked.
+    '''
+    violations = []
+    for board, board_peaks in sorted(peaks.items()):
+        board_budgets = budgets.get(board, {})
+        for strategy, peak in sorted(board_peaks.items()):
+            budget = board_budgets.get(strategy)
+            if budget is not None and peak > budget:
+                violations.append((board, strategy, peak, budget))
+    return violations
+
+def make_budgets(peaks, headroom, floor=0):
+    '''
+    Budgets of headroom times the peaks rounded up to the KiB, and at least
+    floor.
+    '''
+    return {board: {strategy: max(floor, int(math.ceil(
+                                        peak * headroom / 1024.0)) * 1024)
+                    for strategy, peak in board_peaks.items()}
+            for board, board_peaks in peaks.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS)
+    parser.add_argument('--write', action='store_true',
+                        help='write new budgets instead of checking them')
+    parser.add_argument('--headroom', type=float, default=1.5,
+                        help='budgets written are the peaks times this')
+    parser.add_argument('--floor', type=int, default=16384,
+                        help='smallest budget written, in bytes')
+    args = parser.parse_args()
+    peaks = measure(load_corpus(args.corpus))
+    if args.write:
+        with open(args.budgets, 'w') as budgets_file:
+            json.dump(make_budgets(peaks, args.headroom, args.floor),
+                      budgets_file, indent=2, sort_keys=True)
+            budgets_file.write('\n')
+        return
+    with open(args.budgets) as budgets_file:
+        budgets = json.load(budgets_file)
+    violations = over_budget(peaks, budgets)
+    for board, strategy, peak, budget in violations:
+        sys.stdout.write('{} {}: {} bytes, budget {} bytes\n'.format(
+                                                board, strategy, peak, budget))
+    if violations:
+        sys.exit(1)
+    sys.stdout.write('Every strategy is within its budget on {} board '
+                     'sizes.\n'.format(len(peaks)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+'''
+Checks that pondering predicts the boards the next move requests are for.
+
+    $ python -m benchmarks.ponder_keys --games 12
+
+Samaritan plays games against the other bots on the local referee. After
+every move he makes, the boards he'd ponder are worked out (see
+algorithms/ponder.py), and when his next request comes in:
+
+- its board, less the food that spawned in between, must be what
+  Snapshot.advance makes of the last board with the moves that were really
+  made, or the command fails;
+- its board_key is looked up among the pondered ones, to report how often
+  pondering would have answered it, on turns where somebody ate and where
+  nobody did.
+'''
+import argparse
+import sys
+from algorithms.board import Board
+from algorithms.ponder import board_key, likely_next_boards
+from algorithms.snapshot import Snapshot
+from engine.bots import HungryBot, RandomBot
+from engine.referee import Game
+
+
+class CheckedBot(object):
+    '''Samaritan, checking the pondered boards against every request.
+    '''
+    name = 'Samaritan'
+
+    def __init__(self):
+        self.previous = None
+        self.pondered = set()
+        # (somebody ate): [requests, pondered]
+        self.hits = {True: [0, 0], False: [0, 0]}
+        self.mismatches = []
+
+    def get_move(self, request):
+        snapshot = Snapshot.from_data(request)
+        if self.previous is not None and request['turn'] == \
+                self.previous.turn + 1:
+            self.check(snapshot, board_key(request))
+        objective, move = Board(request).get_action()
+        self.previous = snapshot
+        self.pondered = set(next_snapshot.key() for next_snapshot
+                            in likely_next_boards(snapshot, move))
+        return move
+
+    def check(self, snapshot, key):
+        '''Compares the request's snapshot with what was predicted for it.
+        '''
+        previous = self.previous
+        moves = {snake.id: snake.body[0] for snake in snapshot.snakes}
+        predicted = previous.advance(moves)
+        # The food that spawned since can't be predicted.
+        actual = Snapshot(snapshot.width, snapshot.height,
+                          [food for food in snapshot.foods
+                           if food in previous.foods],
+                          snapshot.snakes, snapshot.you, snapshot.turn,
+                          snapshot.game)
+        if predicted.key() != actual.key():
+            self.mismatches.append(snapshot.turn)
+        ate = len(predicted.foods) < len(previous.foods)
+        self.hits[ate][0] += 1
+        if key in self.pondered:
+            self.hits[ate][1] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--games', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--width', type=int, default=11)
+    parser.add_argument('--height', type=int, default=11)
+    args = parser.parse_args()
+    bot = CheckedBot()
+    for game in range(args.games):
+        seed = args.seed + game
+        bot.previous = None
+        Game([('samaritan', bot), ('hungry', HungryBot(seed)),
+              ('random', RandomBot(seed))], args.width, args.height,
+             seed).play()
+    for ate, (requests, pondered) in sorted(bot.hits.items()):
+        sys.stdout.write('{}: {} of {} next requests were pondered\n'.format(
+                'Somebody ate' if ate else 'Nobody ate', pondered, requests))
+    if bot.mismatches:
+        sys.stdout.write('Snapshot.advance got {} boards wrong, on turns '
+                         '{}\n'.format(len(bot.mismatches), bot.mismatches))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+'''
+Merges the profiles written with PROFILE_RATE (see algorithms/profiler.py)
+into a collapsed-stack file, one "frame;frame;frame samples" line per stack.
+
+    $ python -m benchmarks.profiles profiles --board 19x19 --min-ms 100 \
+          > slow.folded
+    $ flamegraph.pl slow.folded > slow.svg
+
+The file can also be opened directly in speedscope. The functions taking
+the most samples are also printed to stderr.
+'''
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+
+def load_profiles(directory, board=None, min_ms=0, objective=None):
+    '''
+    Yields the profiles in directory, only those of board size board, that
+    took at least min_ms and that ended in objective if they are given.
+    '''
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name)) as profile_file:
+            try:
+                profile = json.load(profile_file)
+            except ValueError:
+                continue
+        if board is not None and profile.get('board') != board:
+            continue
+        if profile.get('elapsed_ms', 0) < min_ms:
+            continue
+        if objective is not None and profile.get('objective') != objective:
+            continue
+        yield profile
+
+def merge(profiles):
+    '''Adds up the samples of every stack over profiles.
+    '''
+    stacks = Counter()
+    for profile in profiles:
+        stacks.update(profile['stacks'])
+    return stacks
+
+def self_and_total(stacks):
+    '''
+    Returns the samples in which each function was running itself, and the
+    samples in which it was anywhere on the stack.
+    '''
+    own = Counter()
+    total = Counter()
+    for stack, samples in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += samples
+        for frame in set(frames):
+            total[frame] += samples
+    return own, total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('directory', nargs='?', default='profiles')
+    parser.add_argument('--board', help='only boards of this size, e.g. 19x19')
+    parser.add_argument('--min-ms', type=float, default=0,
+                        help='only requests that took at least this long')
+    parser.add_argument('--objective', help='only moves with this objective')
+    parser.add_argument('--output', help='write the collapsed stacks here '
+                                         'instead of stdout')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+    profiles = list(load_profiles(args.directory, args.board, args.min_ms,
+                                  args.objective))
+    stacks = merge(profiles)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    for stack, samples in sorted(stacks.items()):
+        output.write('{} {}\n'.format(stack, samples))
+    if args.output:
+        output.close()
+    total_samples = sum(stacks.values()) or 1
+    own, total = self_and_total(stacks)
+    sys.stderr.write('{} profiles, {} samples\n'.format(len(profiles),
+                                                        sum(stacks.values())))
+    sys.stderr.write('{:>7} {:>7}  function\n'.format('total', 'self'))
+    for frame, samples in total.most_common(args.top):
+        sys.stderr.write('{:>6.1%} {:>6.1%}  {}\n'.format(
+                                            float(samples) / total_samples,
+                                            float(own[frame]) / total_samples,
+                                            frame))
+
+if __name__ == '__main__':
+    main()
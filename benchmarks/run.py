@@ -0,0 +1,196 @@
+'''
+Times Board construction, get_action, every strategy and every search in
+graph_algorithms over the benchmark corpus.
+
+    $ python -m benchmarks.run --repeat 5 --output results.json
+
+Results are JSON: for every benchmark, the p50/p95/p99 of the timings (in
+milliseconds) over all positions and per board size, and the peak memory
+allocated while running it once under tracemalloc. Compare two runs with
+benchmarks.compare.
+'''
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+import tracemalloc
+from time import perf_counter
+from algorithms.board import Board, reachability_cache
+from algorithms.graph_algorithms import (a_star, bfs, stall, advanced_floodfill,
+    distance_fields)
+from .corpus import DEFAULT_CORPUS, load_corpus
+
+
+def _strategy(method, *args):
+    '''A benchmark that calls a strategy method on a fresh board.
+    '''
+    def run(payload, action):
+        board = Board(payload)
+        return getattr(board, method)(*args)
+    return run
+
+def _paranoia(payload, action):
+    board = Board(payload)
+    return board.get_best_enemy_attack(*action)
+
+def _a_star(payload, action):
+    board = Board(payload)
+    samaritan = board.samaritan
+    return a_star(board, samaritan.get_head(), samaritan.get_tail(), samaritan)
+
+def _bfs(payload, action):
+    board = Board(payload)
+    samaritan = board.samaritan
+    return bfs(board, samaritan.get_head(), samaritan.get_tail(), samaritan)
+
+def _stall(payload, action):
+    return stall(Board(payload))
+
+def _advanced_floodfill(payload, action):
+    board = Board(payload)
+    return advanced_floodfill(board, board.samaritan.get_head(),
+                              board.samaritan)
+
+# name: function(payload, (objective, move) from get_action)
+BENCHMARKS = [
+    ('Board', lambda payload, action: Board(payload)),
+    ('get_action', lambda payload, action: Board(payload).get_action()),
+    ('cornering_enemies', _strategy('cornering_enemies')),
+    ('trapping_enemies', _strategy('trapping_enemies')),
+    ('walling_enemies', _strategy('walling_enemies')),
+    ('find_path_to_food Safe', _strategy('find_path_to_food', 'Safe')),
+    ('find_path_to_food Risky', _strategy('find_path_to_food', 'Risky')),
+    ('attack_enemy', _strategy('attack_enemy')),
+    ('find_path_to_my_tail', _strategy('find_path_to_my_tail')),
+    ('get_best_enemy_attack', _paranoia),
+    ('a_star', _a_star),
+    ('bfs', _bfs),
+    ('stall', _stall),
+    ('advanced_floodfill', _advanced_floodfill),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--filter', help='only positions with this in their '
+                                         'name')
+    parser.add_argument('--benchmark', action='append',
+                        help='only run this benchmark (can be repeated)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-memory', action='store_true',
+                        help="don't measure peak memory")
+    parser.add_argument('--output', help='write the JSON here instead of '
+                                         'to stdout')
+    args = parser.parse_args()
+    positions = load_corpus(args.corpus, args.filter)
+    benchmarks = [(name, function) for name, function in BENCHMARKS
+                  if not args.benchmark or name in args.benchmark]
+    results = run_benchmarks(positions, benchmarks, args.repeat,
+                             not args.no_memory)
+    report = {'meta': metadata(args, positions), 'results': results}
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+def run_benchmarks(positions, benchmarks, repeat, measure_memory=True):
+    '''
+    Runs every benchmark repeat times on every position. Returns the
+    statistics for each benchmark, overall and by board size.
+    '''
+    actions = {position['name']: Board(position['payload']).get_action()
+               for position in positions}
+    results = {}
+    for name, function in benchmarks:
+        timings = []
+        by_board = {}
+        peak_memory = 0
+        for position in positions:
+            payload = position['payload']
+            action = actions[position['name']]
+            for _ in range(repeat):
+                # Otherwise every repeat after the first is answered from them.
+                clear_caches()
+                start = perf_counter()
+                function(payload, action)
+                elapsed = (perf_counter() - start) * 1000
+                timings.append(elapsed)
+                by_board.setdefault(position['board'], []).append(elapsed)
+            if measure_memory:
+                peak_memory = max(peak_memory,
+                                  measure_peak_memory(function, payload, action))
+        results[name] = summarize(timings)
+        results[name]['by_board'] = {board: summarize(board_timings)
+                                     for board, board_timings in by_board.items()}
+        if measure_memory:
+            results[name]['peak_memory_bytes'] = peak_memory
+    return results
+
+def clear_caches():
+    '''
+    Empties the caches Boards share (tail reachability and the distance
+    fields of A*), so every run starts cold whatever ran before it.
+    '''
+    reachability_cache.clear()
+    distance_fields.clear()
+
+def measure_peak_memory(function, *args):
+    '''Returns the most memory allocated at once while running function.
+    '''
+    clear_caches()
+    tracemalloc.start()
+    try:
+        function(*args)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def percentile(ordered, fraction):
+    '''Nearest-rank percentile of a sorted list.
+    '''
+    if not ordered:
+        return None
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+def summarize(timings):
+    '''Statistics of a list of timings in milliseconds.
+    '''
+    ordered = sorted(timings)
+    return {
+        'count': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) if ordered else None,
+        'p50_ms': percentile(ordered, 0.50),
+        'p95_ms': percentile(ordered, 0.95),
+        'p99_ms': percentile(ordered, 0.99),
+        'max_ms': ordered[-1] if ordered else None,
+    }
+
+def metadata(args, positions):
+    '''Where and on what the benchmarks were run.
+    '''
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'corpus': args.corpus,
+        'corpus_versions': sorted(set(position['version']
+                                      for position in positions)),
+        'positions': len(positions),
+        'repeat': args.repeat,
+    }
+
+if __name__ == '__main__':
+    main()
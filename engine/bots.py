@@ -0,0 +1,118 @@
+'''
+Bots the referee can play. Each one answers a 2019 API move request with a
+move, like a snake server would, but in-process.
+'''
+import random
+from algorithms.board import Board
+from algorithms.replanner import Replanner
+from algorithms.opponents import OpponentModel
+from algorithms import counters
+from .referee import DIRECTIONS
+
+
+class SamaritanBot(object):
+    '''
+    Samaritan himself, with a replanner and an opponent model per game like
+    samaritan.py. He can be given his own parameters (see
+    DEFAULT_PARAMETERS). With SEARCH_COUNTERS=1 the work his searches do is
+    added up over every move.
+    '''
+    name = 'Samaritan'
+
+    def __init__(self, seed=0, parameters=None):
+        self.parameters = parameters
+        self.replanners = {}
+        self.opponent_models = {}
+        self.work = {}
+
+    def start(self, game_id):
+        self.replanners[game_id] = Replanner()
+        self.opponent_models[game_id] = OpponentModel()
+
+    def get_move(self, request):
+        replanner = self.replanners.setdefault(request['game']['id'],
+                                               Replanner())
+        opponent_model = self.opponent_models.setdefault(
+            request['game']['id'], OpponentModel())
+        opponent_model.observe(request)
+        counters.reset()
+        objective, move = Board(request, replanner=replanner,
+                                parameters=self.parameters,
+                                opponents=opponent_model).get_action()
+        for name, amount in counters.snapshot().items():
+            self.work[name] = self.work.get(name, 0) + amount
+        return move
+
+    def stats(self):
+        '''The work done by the searches over every move so far.
+        '''
+        return {'work': dict(self.work)}
+
+    def end(self, game_id):
+        self.replanners.pop(game_id, None)
+        self.opponent_models.pop(game_id, None)
+
+
+class RandomBot(object):
+    '''Moves randomly, but never into a wall or a body if it can help it.
+    '''
+    name = 'Random'
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+
+    def get_move(self, request):
+        moves = safe_moves(request)
+        return self.random.choice(moves or list(DIRECTIONS))
+
+
+class HungryBot(object):
+    '''Always takes the safe move that gets it closest to the nearest food.
+    '''
+    name = 'Hungry'
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+
+    def get_move(self, request):
+        moves = safe_moves(request)
+        if not moves:
+            return self.random.choice(list(DIRECTIONS))
+        foods = [(food['x'], food['y']) for food in request['board']['food']]
+        if not foods:
+            return self.random.choice(moves)
+        head = request['you']['body'][0]
+
+        def distance_to_food(move):
+            dx, dy = DIRECTIONS[move]
+            x, y = head['x'] + dx, head['y'] + dy
+            return min(abs(x - food_x) + abs(y - food_y)
+                       for food_x, food_y in foods)
+        return min(moves, key=distance_to_food)
+
+
+BOTS = {
+    'samaritan': SamaritanBot,
+    'random': RandomBot,
+    'hungry': HungryBot,
+}
+
+
+def safe_moves(request):
+    '''
+    Returns the moves that don't run into a wall or a body next turn. Tails
+    are treated as moving away.
+    '''
+    board = request['board']
+    blocked = set()
+    for snake in board['snakes']:
+        for point in snake['body'][:-1]:
+            blocked.add((point['x'], point['y']))
+    head = request['you']['body'][0]
+    moves = []
+    for move, (dx, dy) in DIRECTIONS.items():
+        x, y = head['x'] + dx, head['y'] + dy
+        if (0 <= x < board['width'] and 0 <= y < board['height']
+            and (x, y) not in blocked):
+            moves.append(move)
+    return moves
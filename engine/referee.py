@@ -0,0 +1,209 @@
+'''
+A local referee that plays games by the Battlesnake rules without a game
+server. Every turn the referee asks every snake's bot for a move, with the
+same 2019 API request a game server would send, and then:
+
+- moves every snake at the same time and takes 1 health from each,
+- feeds snakes that moved onto food (health back to 100, they grow by one),
+- spawns food,
+- eliminates snakes that starved, left the board, ran into a body, or lost a
+  head-to-head collision (the shorter snake loses, equal lengths both lose).
+
+All randomness comes from the seed the game is given, so a game with the
+same seed and bots is played exactly the same way again.
+'''
+import random
+from time import perf_counter
+
+DIRECTIONS = {
+    'up': (0, -1),
+    'down': (0, 1),
+    'left': (-1, 0),
+    'right': (1, 0),
+}
+START_HEALTH = 100
+START_LENGTH = 3
+# Chance of a piece of food spawning on a turn, on top of keeping at least
+# MINIMUM_FOOD on the board.
+FOOD_SPAWN_CHANCE = 0.15
+MINIMUM_FOOD = 1
+MAX_TURNS = 1000
+
+
+class Game(object):
+    '''
+    A single game between bots. bots is a list of (snake id, bot) where a bot
+    is anything with a get_move(request) method that returns up, down, left
+    or right.
+    '''
+
+    def __init__(self, bots, width=11, height=11, seed=0, game_id=None,
+                 max_turns=MAX_TURNS):
+        '''Places the snakes and the starting food.
+        '''
+        self.random = random.Random(seed)
+        self.width = width
+        self.height = height
+        self.id = game_id if game_id is not None else 'local-{}'.format(seed)
+        self.turn = 0
+        self.max_turns = max_turns
+        self.bots = dict(bots)
+        self.snakes = []
+        self.eliminated = {}
+        self.foods = []
+        starts = start_positions(width, height)
+        self.random.shuffle(starts)
+        if len(bots) > len(starts):
+            raise ValueError('At most {} snakes fit on a {}x{} board'.format(
+                                                len(starts), width, height))
+        for (snake_id, bot), start in zip(bots, starts):
+            self.snakes.append({
+                'id': snake_id,
+                'name': getattr(bot, 'name', snake_id),
+                'health': START_HEALTH,
+                'body': [start] * START_LENGTH,
+            })
+        for _ in self.snakes:
+            self.spawn_food()
+
+    def play(self):
+        '''
+        Plays the game to the end. Returns the result: the winner's id (None
+        if nobody survived), the number of turns, how long every bot took
+        for each move in ms and the stats of bots that keep any.
+        '''
+        move_times = {snake_id: [] for snake_id in self.bots}
+        for bot in self.bots.values():
+            if hasattr(bot, 'start'):
+                bot.start(self.id)
+        while len(self.snakes) > (1 if len(self.bots) > 1 else 0):
+            if self.turn >= self.max_turns:
+                break
+            moves = {}
+            for snake in self.snakes:
+                start = perf_counter()
+                moves[snake['id']] = self.bots[snake['id']].get_move(
+                                                    self.request(snake['id']))
+                move_times[snake['id']].append((perf_counter() - start) * 1000)
+            self.step(moves)
+        for bot in self.bots.values():
+            if hasattr(bot, 'end'):
+                bot.end(self.id)
+        bot_stats = {snake_id: bot.stats()
+                     for snake_id, bot in self.bots.items()
+                     if hasattr(bot, 'stats')}
+        return {
+            'id': self.id,
+            'winner': (self.snakes[0]['id']
+                       if len(self.snakes) == 1 and len(self.bots) > 1
+                       else None),
+            'turns': self.turn,
+            'survivors': [snake['id'] for snake in self.snakes],
+            'eliminated': self.eliminated,
+            'move_times': move_times,
+            'bot_stats': bot_stats,
+        }
+
+    def step(self, moves):
+        '''Plays a turn given every living snake's move.
+        '''
+        for snake in self.snakes:
+            move = moves.get(snake['id'])
+            if move not in DIRECTIONS:
+                move = 'up'
+            dx, dy = DIRECTIONS[move]
+            head_x, head_y = snake['body'][0]
+            snake['body'].insert(0, (head_x + dx, head_y + dy))
+            snake['body'].pop()
+            snake['health'] -= 1
+        for snake in self.snakes:
+            if snake['body'][0] in self.foods:
+                self.foods.remove(snake['body'][0])
+                snake['health'] = START_HEALTH
+                snake['body'].append(snake['body'][-1])
+        self.spawn_food()
+        self.turn += 1
+        self.eliminate()
+
+    def eliminate(self):
+        '''Removes every snake that died this turn.
+        '''
+        bodies = set()
+        for snake in self.snakes:
+            bodies.update(snake['body'][1:])
+        heads = {}
+        for snake in self.snakes:
+            heads.setdefault(snake['body'][0], []).append(snake)
+        dead = {}
+        for snake in self.snakes:
+            head_x, head_y = head = snake['body'][0]
+            if snake['health'] <= 0:
+                dead[snake['id']] = 'starvation'
+            elif not (0 <= head_x < self.width and 0 <= head_y < self.height):
+                dead[snake['id']] = 'wall'
+            elif head in bodies:
+                dead[snake['id']] = 'body collision'
+            else:
+                for other in heads[head]:
+                    if (other is not snake
+                        and len(other['body']) >= len(snake['body'])):
+                        dead[snake['id']] = 'head collision'
+        for snake_id, cause in dead.items():
+            self.eliminated[snake_id] = {'turn': self.turn, 'cause': cause}
+        self.snakes = [snake for snake in self.snakes
+                       if snake['id'] not in dead]
+
+    def spawn_food(self):
+        '''
+        Spawns a piece of food on a random empty node if there's too little
+        food, or by chance.
+        '''
+        if (len(self.foods) >= MINIMUM_FOOD
+            and self.random.random() >= FOOD_SPAWN_CHANCE):
+            return
+        occupied = set(self.foods)
+        for snake in self.snakes:
+            occupied.update(snake['body'])
+        empty = [(x, y) for y in range(self.height) for x in range(self.width)
+                 if (x, y) not in occupied]
+        if empty:
+            self.foods.append(self.random.choice(empty))
+
+    def request(self, snake_id):
+        '''
+        Returns the 2019 API move request the game server would send to
+        snake_id's bot.
+        '''
+        snakes = [snake_payload(snake) for snake in self.snakes]
+        return {
+            'game': {'id': self.id},
+            'turn': self.turn,
+            'board': {
+                'width': self.width,
+                'height': self.height,
+                'food': [{'x': x, 'y': y} for x, y in self.foods],
+                'snakes': snakes,
+            },
+            'you': [snake for snake in snakes if snake['id'] == snake_id][0],
+        }
+
+
+def snake_payload(snake):
+    '''Returns a snake as it appears in a 2019 API request.
+    '''
+    return {
+        'id': snake['id'],
+        'name': snake['name'],
+        'health': snake['health'],
+        'body': [{'x': x, 'y': y} for x, y in snake['body']],
+    }
+
+def start_positions(width, height):
+    '''
+    Returns the nodes snakes start on: the corners one step in from the
+    edges, then the middles of the edges. Up to 8 snakes fit.
+    '''
+    low_x, mid_x, high_x = 1, (width - 1) // 2, width - 2
+    low_y, mid_y, high_y = 1, (height - 1) // 2, height - 2
+    return [(low_x, low_y), (high_x, high_y), (low_x, high_y), (high_x, low_y),
+            (mid_x, low_y), (mid_x, high_y), (low_x, mid_y), (high_x, mid_y)]
@@ -0,0 +1,118 @@
+'''
+Plays many local games in parallel and reports win rates and how long each
+bot took per move.
+
+    $ python -m engine.selfplay --games 200 --workers 8 \
+          --bots samaritan samaritan random hungry
+
+Game n is played with seed (--seed + n), so the same command plays the
+same games again.
+'''
+import argparse
+import json
+import sys
+from multiprocessing import Pool
+from benchmarks.run import summarize
+from .bots import BOTS
+from .referee import Game, MAX_TURNS
+
+
+def play_game(task):
+    '''
+    Plays a single game. task is (seed, bots, width, height, max turns) where
+    bots is a list of bot names, or (bot name, label, keyword arguments) to
+    make a bot with other settings and report it under label. Runs in a
+    worker process.
+    '''
+    seed, bot_specs, width, height, max_turns = task
+    bots = []
+    labels = {}
+    for index, spec in enumerate(bot_specs):
+        if isinstance(spec, str):
+            spec = (spec, spec, {})
+        name, label, arguments = spec
+        snake_id = 'snake-{}'.format(index)
+        bots.append((snake_id, BOTS[name](seed * 100 + index, **arguments)))
+        labels[snake_id] = label
+    result = Game(bots, width, height, seed, max_turns=max_turns).play()
+    result['seed'] = seed
+    result['bots'] = labels
+    return result
+
+def play_games(bot_names, games, workers=1, seed=0, width=11, height=11,
+               max_turns=MAX_TURNS):
+    '''
+    Plays games between bot_names (names or specs, see play_game) and yields
+    each result, in seed order.
+    '''
+    tasks = [(seed + number, bot_names, width, height, max_turns)
+             for number in range(games)]
+    if workers <= 1:
+        for task in tasks:
+            yield play_game(task)
+        return
+    pool = Pool(workers)
+    try:
+        for result in pool.imap(play_game, tasks):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+def summarize_games(results):
+    '''
+    Wins, draws and per-move timings for each bot over a list of game results.
+    '''
+    wins = {}
+    move_times = {}
+    draws = 0
+    turns = []
+    for result in results:
+        turns.append(result['turns'])
+        if result['winner'] is None:
+            draws += 1
+        else:
+            name = result['bots'][result['winner']]
+            wins[name] = wins.get(name, 0) + 1
+        for snake_id, times in result['move_times'].items():
+            move_times.setdefault(result['bots'][snake_id], []).extend(times)
+    games = len(results)
+    return {
+        'games': games,
+        'draws': draws,
+        'wins': wins,
+        'win_rates': {name: float(count) / games
+                      for name, count in wins.items()} if games else {},
+        'mean_turns': float(sum(turns)) / games if games else None,
+        'move_ms': {name: summarize(times)
+                    for name, times in move_times.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--bots', nargs='+', choices=sorted(BOTS),
+                        default=['samaritan', 'samaritan'])
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--width', type=int, default=11)
+    parser.add_argument('--height', type=int, default=11)
+    parser.add_argument('--max-turns', type=int, default=MAX_TURNS)
+    parser.add_argument('--results', help='also write every game result to '
+                                          'this file, one JSON per line')
+    args = parser.parse_args()
+    results = []
+    results_file = open(args.results, 'w') if args.results else None
+    for result in play_games(args.bots, args.games, args.workers, args.seed,
+                             args.width, args.height, args.max_turns):
+        results.append(result)
+        if results_file is not None:
+            results_file.write(json.dumps(result, sort_keys=True) + '\n')
+    if results_file is not None:
+        results_file.close()
+    summary = summarize_games(results)
+    summary['bots'] = args.bots
+    sys.stdout.write(json.dumps(summary, indent=2, sort_keys=True) + '\n')
+
+if __name__ == '__main__':
+    main()
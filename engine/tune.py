@@ -0,0 +1,170 @@
+'''
+Searches for better values of the costs and limits in DEFAULT_PARAMETERS by
+playing local games.
+
+    $ SEARCH_COUNTERS=1 python -m engine.tune --strategy es --candidates 40 \
+          --games 50 --workers 8
+
+Every candidate plays the same seeded games as Samaritan against the
+opponents (by default Samaritan with the default parameters and the hungry
+bot). For each candidate we print a JSON line with its parameters, its win
+rate, its move latency and, with SEARCH_COUNTERS=1, how many nodes its
+searches expanded per move. At the end the candidates that no other
+candidate beats on both win rate and p95 latency are printed.
+
+Strategies:
+random: every candidate is drawn uniformly from SEARCH_SPACE.
+es: an evolution strategy in the spirit of CMA-ES, with a diagonal
+    covariance. Each generation draws candidates around a mean, and the
+    mean and spread move to those of the best quarter of them.
+'''
+import argparse
+import json
+import random
+import sys
+from algorithms.constants import DEFAULT_PARAMETERS
+from .selfplay import play_games, summarize_games
+
+# parameter: (lowest, highest)
+SEARCH_SPACE = {
+    'larger_head_diagonal_cost': (0, 8),
+    'larger_head_diagonal_cost_right': (0, 8),
+    'equal_head_diagonal_cost': (0, 5),
+    'larger_head_adjacent_cost': (0, 15),
+    'edge_cost': (0, 4),
+    'health_limit': (10, 90),
+    'health_limit_alone': (10, 100),
+    'safe_food_cost_divisor': (2, 12),
+}
+CANDIDATE = 'candidate'
+EXPANDED_COUNTERS = ('a_star_expanded', 'bfs_expanded', 'stall_expanded',
+                     'floodfill_expanded')
+
+
+def evaluate(parameters, opponents, games, workers, seed, width, height):
+    '''
+    Plays games with Samaritan using parameters against opponents. Returns
+    his win rate, his move latency and the nodes he expanded per move.
+    '''
+    bots = [('samaritan', CANDIDATE, {'parameters': parameters})] + opponents
+    results = list(play_games(bots, games, workers, seed, width, height))
+    summary = summarize_games(results)
+    moves = summary['move_ms'].get(CANDIDATE, {}).get('count') or 1
+    expanded = 0
+    for result in results:
+        for snake_id, stats in result['bot_stats'].items():
+            if result['bots'][snake_id] == CANDIDATE:
+                expanded += sum(stats['work'].get(counter, 0)
+                                for counter in EXPANDED_COUNTERS)
+    return {
+        'parameters': parameters,
+        'win_rate': summary['win_rates'].get(CANDIDATE, 0.0),
+        'draw_rate': float(summary['draws']) / games,
+        'p50_ms': summary['move_ms'][CANDIDATE]['p50_ms'],
+        'p95_ms': summary['move_ms'][CANDIDATE]['p95_ms'],
+        'expanded_per_move': float(expanded) / moves,
+    }
+
+def random_candidate(rnd):
+    '''Draws every parameter uniformly from SEARCH_SPACE.
+    '''
+    return {name: rnd.randint(low, high)
+            for name, (low, high) in SEARCH_SPACE.items()}
+
+def es_candidates(rnd, mean, spread, count):
+    '''
+    Draws count candidates around mean, each parameter from a normal
+    distribution with its spread, rounded and clipped to SEARCH_SPACE.
+    '''
+    candidates = []
+    for _ in range(count):
+        candidate = {}
+        for name, (low, high) in SEARCH_SPACE.items():
+            value = int(round(rnd.gauss(mean[name], spread[name])))
+            candidate[name] = min(high, max(low, value))
+        candidates.append(candidate)
+    return candidates
+
+def fitness(evaluation, latency_weight):
+    '''Win rate, less a penalty for every 100ms of p95 latency.
+    '''
+    return (evaluation['win_rate']
+            - latency_weight * evaluation['p95_ms'] / 100.0)
+
+def pareto_front(evaluations):
+    '''
+    The evaluations no other evaluation beats on both win rate and p95
+    latency.
+    '''
+    front = []
+    for evaluation in evaluations:
+        dominated = False
+        for other in evaluations:
+            if (other['win_rate'] >= evaluation['win_rate']
+                and other['p95_ms'] <= evaluation['p95_ms']
+                and (other['win_rate'] > evaluation['win_rate']
+                     or other['p95_ms'] < evaluation['p95_ms'])):
+                dominated = True
+                break
+        if not dominated:
+            front.append(evaluation)
+    return sorted(front, key=lambda evaluation: -evaluation['win_rate'])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--strategy', choices=('random', 'es'),
+                        default='random')
+    parser.add_argument('--candidates', type=int, default=20)
+    parser.add_argument('--generation-size', type=int, default=8,
+                        help='candidates per generation for es')
+    parser.add_argument('--games', type=int, default=20,
+                        help='games played by every candidate')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--opponents', nargs='+',
+                        default=['samaritan', 'hungry'])
+    parser.add_argument('--width', type=int, default=11)
+    parser.add_argument('--height', type=int, default=11)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency-weight', type=float, default=0.1,
+                        help='win rate given up for 100ms of p95 latency, '
+                             'used to rank es candidates')
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+
+    def run(parameters):
+        evaluation = evaluate(parameters, args.opponents, args.games,
+                              args.workers, args.seed, args.width,
+                              args.height)
+        sys.stdout.write(json.dumps(evaluation, sort_keys=True) + '\n')
+        sys.stdout.flush()
+        return evaluation
+
+    evaluations = [run(dict(DEFAULT_PARAMETERS))]
+    if args.strategy == 'random':
+        while len(evaluations) < args.candidates:
+            evaluations.append(run(random_candidate(rnd)))
+    else:
+        mean = {name: float(DEFAULT_PARAMETERS[name]) for name in SEARCH_SPACE}
+        spread = {name: (high - low) / 4.0
+                  for name, (low, high) in SEARCH_SPACE.items()}
+        while len(evaluations) < args.candidates:
+            count = min(args.generation_size,
+                        args.candidates - len(evaluations))
+            generation = [run(candidate) for candidate in
+                          es_candidates(rnd, mean, spread, count)]
+            evaluations.extend(generation)
+            generation.sort(key=lambda evaluation: -fitness(
+                                            evaluation, args.latency_weight))
+            best = generation[:max(1, len(generation) // 4)]
+            for name, (low, high) in SEARCH_SPACE.items():
+                values = [evaluation['parameters'][name] for evaluation in best]
+                mean[name] = float(sum(values)) / len(values)
+                variance = (sum((value - mean[name]) ** 2 for value in values)
+                            / len(values))
+                # Don't let the spread collapse to nothing.
+                spread[name] = max(variance ** 0.5, (high - low) / 20.0)
+    sys.stdout.write(json.dumps({'pareto_front': pareto_front(evaluations)},
+                                indent=2, sort_keys=True) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,32 @@
+import atexit
 import bottle
 import os
 from algorithms.board import Board
+from algorithms.replanner import Replanner
+from algorithms.opponents import OpponentModel
+from algorithms.ponder import Ponderer
+from algorithms.recorder import Recorder
 from time import time
-from api import ping_response, end_response
-from algorithms.utils import convert_2018_api_to_2019
+from api import ping_response, end_response, metrics_response
+from algorithms.utils import convert_2018_api_to_2019, get_game_id
+from algorithms import logger, metrics, counters, profiler, memory
+
+# Samaritan's plans from the previous turn, one replanner per game.
+replanners = {}
+# What the enemies have done so far, one model per game.
+opponent_models = {}
+# Set MOVE_BUDGET_MS to have paranoia leave out unlikely enemy replies once
+# a move has taken this long.
+MOVE_BUDGET_MS = (float(os.environ['MOVE_BUDGET_MS'])
+                  if os.environ.get('MOVE_BUDGET_MS') else None)
+# Set PONDERING=1 to think about the next move between requests.
+PONDERING = os.environ.get('PONDERING') == '1'
+ponderers = {}
+# Set RECORD_GAMES to a directory to record every game there.
+recorder = (Recorder(os.environ['RECORD_GAMES'])
+            if os.environ.get('RECORD_GAMES') else None)
+if recorder is not None:
+    atexit.register(recorder.close)
 
 @bottle.route('/')
 def static():
@@ -25,7 +48,10 @@ def start():
     When a game starts, this endpoint is called and it gives the customization
     information for Samaritan. It also starts writing to the runtime text file.
     '''
-    return {
+    data = bottle.request.json
+    replanners[get_game_id(data)] = Replanner()
+    opponent_models[get_game_id(data)] = OpponentModel()
+    response = {
         "color": "#D14F52",
         "secondary_color": "#ededed",
         "head_url": "https://i.ytimg.com/vi/er3BMWuf310/maxresdefault.jpg",
@@ -33,6 +59,9 @@ def start():
         "head_type": "smile",
         "tail_type": "freckled"
         }
+    if recorder is not None:
+        recorder.record(get_game_id(data), 'start', data, response)
+    return response
 
 @bottle.post('/move')
 def move():
@@ -43,30 +72,79 @@ def move():
     what move and taunt we want to return by creating an instance of the game
     state and getting an action for our snake, Samaritan.
     '''
-    data = bottle.request.json
-    # Comment the line below for 2019 game server, uncomment for 2018.
-    data = convert_2018_api_to_2019(data)
-    environment = Board(data)
+    request = bottle.request.json
+    # The 2018 game server sends the board's fields at the top level.
+    data = (request if 'board' in request
+            else convert_2018_api_to_2019(request))
+    game_id = get_game_id(data)
+    replanner = replanners.setdefault(game_id, Replanner())
+    opponent_model = opponent_models.setdefault(game_id, OpponentModel())
+    opponent_model.observe(data)
+    counters.reset()
+    memory.reset()
     start = time()
-    objective, action = environment.get_action()
-    print("Time to get move: {}ms".format((time() - start) * 1000))
-    print(objective, action)
-    return {
+    deadline = (start + MOVE_BUDGET_MS / 1000
+                if MOVE_BUDGET_MS is not None else None)
+    pondered = None
+    if PONDERING:
+        ponderer = ponderers.setdefault(game_id, Ponderer())
+        pondered = ponderer.lookup(data)
+    if pondered is not None:
+        objective, action = pondered
+    elif profiler.should_profile(bottle.request.get_header(profiler.HEADER)):
+        environment = Board(data, replanner=replanner,
+                            opponents=opponent_model, deadline=deadline)
+        sampler = profiler.Sampler()
+        objective, action = sampler.run(environment.get_action)
+        profiler.save(sampler, game_id, data.get('turn'),
+                      data['board']['width'], data['board']['height'],
+                      objective)
+    else:
+        environment = Board(data, replanner=replanner,
+                            opponents=opponent_model, deadline=deadline)
+        objective, action = environment.get_action()
+    elapsed = (time() - start) * 1000
+    board_size = '{}x{}'.format(data['board']['width'], data['board']['height'])
+    metrics.observe('samaritan_move_ms', elapsed, board=board_size)
+    work = counters.snapshot()
+    for name, amount in work.items():
+        metrics.observe('samaritan_search_work', amount, counter=name,
+                        board=board_size)
+    logger.info("Time to get move", ms=elapsed, objective=objective,
+                move=action, pondered=pondered is not None, **work)
+    if memory.ENABLED:
+        for strategy, usage in sorted(memory.snapshot().items()):
+            logger.info("Memory used", strategy=strategy, **usage)
+    if PONDERING:
+        ponderer.start(data, action)
+    response = {
         'move': action,
         'taunt': objective
         }
+    if recorder is not None:
+        recorder.record(game_id, 'move', request, response, objective, elapsed)
+    return response
 
 @bottle.post('/end')
 def end():
     data = bottle.request.json
-
-    """
-    TODO: If your snake AI was stateful,
-        clean up any stateful objects here.
-    """
-
+    if recorder is not None:
+        recorder.record(get_game_id(data), 'end', data)
+    replanners.pop(get_game_id(data), None)
+    opponent_models.pop(get_game_id(data), None)
+    ponderer = ponderers.pop(get_game_id(data), None)
+    if ponderer is not None:
+        ponderer.cancel()
     return end_response()
 
+@bottle.get('/metrics')
+def metrics_endpoint():
+    '''
+    Latency histograms for every strategy and how often each objective wins,
+    in the Prometheus text format.
+    '''
+    return metrics_response(metrics.render())
+
 @bottle.post('/ping')
 def ping():
     """
@@ -77,16 +155,25 @@ def ping():
 
 application = bottle.default_app()
 
+# Set WORKERS to answer requests from that many processes (needs gunicorn).
+# Every process keeps its own replanners, so games are best kept on one.
+WORKERS = int(os.environ.get('WORKERS', '1'))
+server_options = {}
+if WORKERS > 1:
+    server_options = {'server': 'gunicorn', 'workers': WORKERS}
+
 if __name__ == '__main__':
     if os.environ.get('APP_LOCATION') == 'heroku':
         bottle.run(
             application,
             host="0.0.0.0",
-            port=int(os.environ.get("PORT", 5000))
+            port=int(os.environ.get("PORT", 5000)),
+            **server_options
         )
     else:
         bottle.run(
             application,
             host=os.getenv('IP', '0.0.0.0'),
             port=os.getenv('PORT', '8099'),
-            debug = True)
+            debug = True,
+            **server_options)